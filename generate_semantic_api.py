@@ -6,14 +6,16 @@ Generates SFT, DPO/ORPO, and GRPO datasets from a code repository in one run.
 Output is drop-in compatible with the FineTuning project's data/ folder.
 """
 
+import asyncio
+import contextlib
 import hashlib
-import json
 import os
 import random
+import re
 import sys
 import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 # Load environment variables from .env file if it exists
 try:
@@ -25,10 +27,21 @@ except ImportError:
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent / 'src'))
 
-from gh_chat_dataset.semantic_pipeline.parser import parse_repository
-from gh_chat_dataset.semantic_pipeline.ontology import OntologyTagger
+from gh_chat_dataset.hash_util import digest128
+from gh_chat_dataset.semantic_pipeline.response_cache import SemanticCache
+from gh_chat_dataset.semantic_pipeline.span_cache import load_tagged_spans
+from gh_chat_dataset.tokenize_util import count_tokens_approx
 
-from anthropic import Anthropic
+import orjson
+from anthropic import AsyncAnthropic, RateLimitError
+from datasketch import MinHash, MinHashLSH
+from openai import AsyncOpenAI
+
+try:
+    # Newer anthropic/openai releases build on httpx2; older ones on httpx.
+    import httpx2 as httpx
+except ImportError:
+    import httpx
 
 DEFAULT_SYSTEM_PROMPT = (
     "You are an expert software engineer and technical analyst. "
@@ -51,6 +64,8 @@ BOILERPLATE_PATTERNS = [
     "code analysis",
     "system component",
 ]
+# One case-insensitive C-level scan instead of lower() + a substring search per pattern.
+_BOILERPLATE_RE = re.compile("|".join(re.escape(p) for p in BOILERPLATE_PATTERNS), re.IGNORECASE)
 
 QUESTION_TEMPLATES = [
     ("explain",    "What does `{name}` do and why is it designed this way?"),
@@ -61,78 +76,372 @@ QUESTION_TEMPLATES = [
     ("compare",    "What are the tradeoffs in the approach taken by `{name}` compared to simpler alternatives?"),
 ]
 
+# Fixed instruction preambles, byte-identical across calls so the prompt cache can match them.
+_GOOD_PREAMBLE = (
+    "Answer this question about the following code. Be specific, use exact variable/function names, "
+    "and include financial reasoning where relevant. Write 3-6 paragraphs.\n\n"
+)
+_BAD_PREAMBLE = (
+    "Write a deliberately vague, generic, unhelpful answer to this question. "
+    "Use AI-isms like 'it is important to note', 'this function handles', 'various operations'. "
+    "Do NOT mention specific variable names, numbers, or financial concepts. Keep it to 2 sentences.\n\n"
+)
+
+
+MAX_ATTEMPTS = 6
+
+SPLIT_SEED = 42
+
+# Emit one progress line per this many finished spans instead of several prints per span.
+PROGRESS_EVERY = 100
+
+# Near-duplicate answers (Jaccard over word 5-gram shingles) are dropped like exact duplicates.
+MINHASH_PERMS = 64
+NEAR_DUP_THRESHOLD = 0.85
+
+# Message Batches API: requests per submitted batch and seconds between status polls.
+BATCH_CHUNK_SIZE = 10_000
+BATCH_POLL_SECONDS = 30.0
+
+# Inputs per embeddings request (the API accepts up to 2048).
+EMBED_BATCH_SIZE = 128
+
+def _http_client() -> httpx.AsyncClient:
+    """Pooled HTTP client shared by the Anthropic and OpenAI SDKs for one generate_dataset call."""
+    # The SDK default caps a client at 100 connections, below the fan-out above.
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=2000, max_keepalive_connections=1500),
+        timeout=httpx.Timeout(120.0),
+    )
+
+
+def _backoff_delay(attempt: int, min_s: float = 1.0, max_s: float = 60.0) -> float:
+    """Random exponential backoff (full jitter) for retry number `attempt` (0-based)."""
+    return max(min_s, random.uniform(0, min(max_s, 2 ** attempt)))
+
+
+class RateLimiter:
+    """Dual token bucket enforcing requests-per-minute and tokens-per-minute ceilings.
+
+    Both buckets refill continuously; `acquire` waits until one request and the
+    estimated token cost are available. A limit of None disables that bucket.
+    """
+
+    def __init__(self, max_rpm: Optional[float] = None, max_tpm: Optional[float] = None):
+        self.max_rpm = max_rpm
+        self.max_tpm = max_tpm
+        self.available_requests = max_rpm or 0.0
+        self.available_tokens = max_tpm or 0.0
+        self.last_update = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.last_update
+        self.last_update = now
+        if self.max_rpm:
+            self.available_requests = min(self.max_rpm, self.available_requests + elapsed * self.max_rpm / 60.0)
+        if self.max_tpm:
+            self.available_tokens = min(self.max_tpm, self.available_tokens + elapsed * self.max_tpm / 60.0)
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        if not self.max_rpm and not self.max_tpm:
+            return
+        # A single request larger than the whole bucket would otherwise never be admitted.
+        if self.max_tpm:
+            estimated_tokens = min(estimated_tokens, int(self.max_tpm))
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = 0.0
+                if self.max_rpm and self.available_requests < 1:
+                    wait = (1 - self.available_requests) * 60.0 / self.max_rpm
+                if self.max_tpm and self.available_tokens < estimated_tokens:
+                    wait = max(wait, (estimated_tokens - self.available_tokens) * 60.0 / self.max_tpm)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.max_rpm:
+                self.available_requests -= 1
+            if self.max_tpm:
+                self.available_tokens -= estimated_tokens
+
 
 def _is_boilerplate(text: str) -> bool:
-    lower = text.lower()
-    return any(p in lower for p in BOILERPLATE_PATTERNS) or len(text.strip()) < 150
+    return len(text.strip()) < 150 or _BOILERPLATE_RE.search(text) is not None
+
+
+def _dedup_key(question: str, answer: str) -> bytes:
+    return digest128((question.encode(), b"\0", answer.encode()))
+
+
+def _answer_minhash(answer: str, k: int = 5) -> MinHash:
+    """MinHash over lowercase word k-gram shingles, for near-duplicate answer detection."""
+    words = answer.lower().split()
+    m = MinHash(num_perm=MINHASH_PERMS)
+    for i in range(max(1, len(words) - k + 1)):
+        m.update(" ".join(words[i:i + k]).encode("utf-8"))
+    return m
+
 
+def _span_cid(span, q_type: str) -> str:
+    """Stable id for a (span, question type) work item, used to resume interrupted runs."""
+    return hashlib.md5(f"{span.source_path}:{span.line_start}:{q_type}".encode()).hexdigest()
 
-def _dedup_key(question: str, answer: str) -> str:
-    return hashlib.md5(f"{question}|||{answer}".encode()).hexdigest()
+
+def _load_raw_records(paths: List[Path], wanted: Set[str]) -> Tuple[set, List[List[Dict]]]:
+    """Load records from existing raw files, keeping only cids in `wanted` and in all of them.
+
+    A crash can leave a torn last line or a record written to one format but not the
+    others; those entries are dropped (and regenerated) so the three files stay aligned.
+    Records outside `wanted` (an earlier run over more spans or another repo) are dropped too.
+    """
+    per_file: List[Dict[str, Dict]] = []
+    for path in paths:
+        records: Dict[str, Dict] = {}
+        if path.exists():
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        rec = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        continue
+                    cid = rec.get("metadata", {}).get("cid")
+                    if cid:
+                        records[cid] = rec
+        per_file.append(records)
+    done = set.intersection(wanted, *(set(records) for records in per_file))
+    order = [cid for cid in per_file[0] if cid in done]
+    return done, [[records[cid] for cid in order] for records in per_file]
+
+
+def _split_bucket(cid: str) -> str:
+    """Deterministic 90/5/5 train/valid/test assignment, stable across reruns and resumes."""
+    r = int(hashlib.md5(f"{SPLIT_SEED}:{cid}".encode()).hexdigest()[:8], 16) / 0x100000000
+    return "train" if r < 0.90 else ("valid" if r < 0.95 else "test")
 
 
 def _span_name(span) -> str:
-    return span.metadata.get("name") or span.source_path.stem
+    return span.name or span.source_path.stem
 
 
-def _build_context(span) -> str:
-    tags = ", ".join(span.metadata.get("tags", [])) or "none"
+def _build_context(span, max_chars: int = 3500) -> str:
+    tags = ", ".join(span.tags) or "none"
+    # Slicing a str no longer than max_chars returns it as-is, so short spans are not copied.
     return (
         f"File: {span.source_path.name}\n"
         f"Type: {span.kind}\n"
         f"Lines: {span.line_start}-{span.line_end}\n"
         f"Tags: {tags}\n\n"
-        f"{span.content[:3500]}"
+        f"{span.content[:max_chars]}"
     )
 
 
+def _prompt_blocks(preamble: str, body: str) -> List[Dict[str, Any]]:
+    """Split a user prompt into a cacheable instruction preamble and the per-span body."""
+    return [
+        {"type": "text", "text": preamble, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": body},
+    ]
+
+
 class DatasetGenerator:
-    def __init__(self, system_prompt: str = DEFAULT_SYSTEM_PROMPT):
-        self.client = Anthropic()
-        self.seen_keys: set = set()
+    def __init__(
+        self,
+        system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+        concurrency: int = 16,
+        max_rpm: Optional[float] = None,
+        max_tpm: Optional[float] = None,
+        use_batch: bool = True,
+        semantic_cache: bool = False,
+        cache_threshold: float = 0.93,
+    ):
+        # API clients are opened per generate_dataset call (their pool is bound to its event loop).
+        self.client: Optional[AsyncAnthropic] = None
+        self.openai: Optional[AsyncOpenAI] = None
+        self.seen_keys: Set[bytes] = set()
+        self.lsh = MinHashLSH(threshold=NEAR_DUP_THRESHOLD, num_perm=MINHASH_PERMS)
         self.success = 0
         self.skipped = 0
         self.system_prompt = system_prompt
+        # Max spans in flight at once; each span issues two Claude calls concurrently.
+        self.concurrency = max(1, concurrency)
+        self.max_rpm = max_rpm
+        self.max_tpm = max_tpm
+        self.rate_limiter = RateLimiter(max_rpm=max_rpm, max_tpm=max_tpm)
+        # Submit all prompts through the Message Batches API instead of live calls.
+        self.use_batch = use_batch
+        # Opt-in reuse of good answers for identical / near-identical prompts across runs.
+        self.semantic_cache = semantic_cache
+        self.cache_threshold = cache_threshold
+        self.cache: Optional[SemanticCache] = None
+        self.cache_hits = 0
+
+    def _message_params(self, user_prompt: List[Dict[str, Any]], max_tokens: int) -> Dict[str, Any]:
+        # The system prompt is identical across every call, so cache it.
+        return {
+            "model": "claude-sonnet-4-6",
+            "max_tokens": max_tokens,
+            "system": [{"type": "text", "text": self.system_prompt, "cache_control": {"type": "ephemeral"}}],
+            "messages": [{"role": "user", "content": user_prompt}],
+        }
 
-    def _call_claude(self, user_prompt: str, max_tokens: int = 1000) -> Optional[str]:
-        try:
-            response = self.client.messages.create(
-                model="claude-sonnet-4-6",
-                max_tokens=max_tokens,
-                temperature=0.4,
-                system=self.system_prompt,
-                messages=[{"role": "user", "content": user_prompt}],
-            )
-            return "".join(b.text for b in response.content if hasattr(b, "text"))
-        except Exception as e:
-            print(f"    Claude error: {e}")
-            return None
+    async def _embed(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Embed texts in EMBED_BATCH_SIZE chunks; failed chunks yield None vectors."""
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            chunk = texts[start:start + EMBED_BATCH_SIZE]
+            try:
+                response = await self.openai.embeddings.create(model="text-embedding-3-small", input=chunk)
+            except Exception as e:
+                print(f"    Embedding error, skipping cache for {len(chunk)} prompts: {e}")
+                continue
+            for item in response.data:
+                vectors[start + item.index] = item.embedding
+        return vectors
+
+    async def _cache_lookup_many(
+        self, prompt_texts: List[str]
+    ) -> List[Tuple[Optional[str], Optional[List[float]]]]:
+        """Return (cached answer, prompt embedding) per prompt; embedding is None on exact hits or errors."""
+        if self.cache is None:
+            return [(None, None)] * len(prompt_texts)
+        results: List[Tuple[Optional[str], Optional[List[float]]]] = [
+            (self.cache.get_exact(text), None) for text in prompt_texts
+        ]
+        missing = [i for i, (answer, _) in enumerate(results) if answer is None]
+        vectors = await self._embed([prompt_texts[i] for i in missing])
+        for i, vector in zip(missing, vectors):
+            results[i] = (self.cache.search(vector) if vector is not None else None, vector)
+        self.cache_hits += sum(1 for answer, _ in results if answer is not None)
+        return results
+
+    async def _cache_lookup(self, prompt_text: str) -> Tuple[Optional[str], Optional[List[float]]]:
+        return (await self._cache_lookup_many([prompt_text]))[0]
+
+    def _cache_store(self, prompt_text: str, vector: Optional[List[float]], answer: Optional[str]) -> None:
+        if self.cache is None or vector is None or not answer:
+            return
+        self.cache.add(prompt_text, vector, answer, {"model": "claude-sonnet-4-6"})
+
+    async def _call_claude(
+        self, user_prompt: List[Dict[str, Any]], max_tokens: int = 1000, cacheable: bool = False
+    ) -> Optional[str]:
+        prompt_text = "".join(block["text"] for block in user_prompt)
+        vector = None
+        if cacheable:
+            cached, vector = await self._cache_lookup(prompt_text)
+            if cached is not None:
+                return cached
+        answer = await self._request_claude(user_prompt, prompt_text, max_tokens)
+        self._cache_store(prompt_text, vector, answer)
+        return answer
+
+    async def _request_claude(
+        self, user_prompt: List[Dict[str, Any]], prompt_text: str, max_tokens: int
+    ) -> Optional[str]:
+        estimated_tokens = count_tokens_approx(self.system_prompt) + count_tokens_approx(prompt_text) + max_tokens
+        for attempt in range(MAX_ATTEMPTS):
+            await self.rate_limiter.acquire(estimated_tokens)
+            try:
+                response = await self.client.messages.create(**self._message_params(user_prompt, max_tokens))
+                return "".join(b.text for b in response.content if hasattr(b, "text"))
+            except RateLimitError as e:
+                if attempt == MAX_ATTEMPTS - 1:
+                    print(f"    Claude rate limited, giving up: {e}")
+                    return None
+                await asyncio.sleep(_backoff_delay(attempt))
+            except Exception as e:
+                print(f"    Claude error: {e}")
+                return None
+        return None
+
+    async def _run_batch(self, requests: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+        """Submit requests via the Message Batches API and return answer text by custom_id."""
+        batch_ids: List[str] = []
+        for start in range(0, len(requests), BATCH_CHUNK_SIZE):
+            batch = await self.client.messages.batches.create(requests=requests[start:start + BATCH_CHUNK_SIZE])
+            print(f"  Submitted batch {batch.id} ({min(BATCH_CHUNK_SIZE, len(requests) - start)} requests)")
+            batch_ids.append(batch.id)
+
+        answers: Dict[str, Optional[str]] = {}
+        for batch_id in batch_ids:
+            while True:
+                batch = await self.client.messages.batches.retrieve(batch_id)
+                if batch.processing_status == "ended":
+                    break
+                counts = batch.request_counts
+                print(f"  Batch {batch_id}: {counts.processing} processing, {counts.succeeded} succeeded")
+                await asyncio.sleep(BATCH_POLL_SECONDS)
+            async for entry in await self.client.messages.batches.results(batch_id):
+                if entry.result.type == "succeeded":
+                    message = entry.result.message
+                    answers[entry.custom_id] = "".join(b.text for b in message.content if hasattr(b, "text"))
+                else:
+                    print(f"    Batch request {entry.custom_id} {entry.result.type}")
+                    answers[entry.custom_id] = None
+        return answers
 
-    def generate_for_span(self, span, q_type: str, question_template: str, repo_name: str = "") -> Optional[Dict[str, Any]]:
+    def _build_prompts(
+        self, span, question_template: str, repo_name: str
+    ) -> Tuple[str, List[Dict[str, Any]], List[Dict[str, Any]]]:
         name = _span_name(span)
         question = question_template.format(name=name, repo=repo_name)
-        context = _build_context(span)
-
-        # --- Generate the GOOD answer ---
-        good_prompt = (
-            f"Answer this question about the following code. Be specific, use exact variable/function names, "
-            f"and include financial reasoning where relevant. Write 3-6 paragraphs.\n\n"
-            f"Question: {question}\n\n"
-            f"Code:\n{context}"
+
+        # --- GOOD answer prompt (the only one that carries the code context) ---
+        good_prompt = _prompt_blocks(
+            _GOOD_PREAMBLE, "".join(("Question: ", question, "\n\nCode:\n", _build_context(span)))
         )
-        good_answer = self._call_claude(good_prompt, max_tokens=1200)
+        # --- BAD answer prompt (for DPO rejected) ---
+        bad_prompt = _prompt_blocks(_BAD_PREAMBLE, "Question: " + question)
+        return question, good_prompt, bad_prompt
+
+    async def generate_for_span(
+        self, span, q_type: str, question_template: str, repo_name: str = ""
+    ) -> Optional[Dict[str, Any]]:
+        question, good_prompt, bad_prompt = self._build_prompts(span, question_template, repo_name)
+
+        # Both prompts are independent, so issue them concurrently.
+        good_answer, bad_answer = await asyncio.gather(
+            self._call_claude(good_prompt, max_tokens=1200, cacheable=True),
+            self._call_claude(bad_prompt, max_tokens=200),
+        )
+        return self._build_records(span, q_type, question, good_answer, bad_answer)
+
+    async def generate_batch(self, work: List[Tuple], repo_name: str = "") -> List[Tuple]:
+        """Two-pass batch flow: submit every good/bad prompt, then join answers per span."""
+        prompts = [self._build_prompts(span, template, repo_name) for span, _, template in work]
+        good_texts = ["".join(block["text"] for block in good) for _, good, _ in prompts]
+        lookups = await self._cache_lookup_many(good_texts)
+
+        requests: List[Dict[str, Any]] = []
+        answers: Dict[str, Optional[str]] = {}
+        for idx, (_, good_prompt, bad_prompt) in enumerate(prompts):
+            cached, _ = lookups[idx]
+            if cached is not None:
+                answers[f"{idx}-good"] = cached
+            else:
+                requests.append({"custom_id": f"{idx}-good", "params": self._message_params(good_prompt, 1200)})
+            requests.append({"custom_id": f"{idx}-bad", "params": self._message_params(bad_prompt, 200)})
+        answers.update(await self._run_batch(requests))
+        for idx, (cached, vector) in enumerate(lookups):
+            if cached is None:
+                self._cache_store(good_texts[idx], vector, answers.get(f"{idx}-good"))
+
+        results: List[Tuple] = []
+        for idx, ((span, q_type, _), (question, _, _)) in enumerate(zip(work, prompts)):
+            result = self._build_records(
+                span, q_type, question, answers.get(f"{idx}-good"), answers.get(f"{idx}-bad")
+            )
+            results.append((span, q_type, result))
+        return results
+
+    def _build_records(
+        self, span, q_type: str, question: str, good_answer: Optional[str], bad_answer: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
         if not good_answer or _is_boilerplate(good_answer):
             self.skipped += 1
             return None
-
-        # --- Generate the BAD answer (for DPO rejected) ---
-        bad_prompt = (
-            f"Write a deliberately vague, generic, unhelpful answer to this question. "
-            f"Use AI-isms like 'it is important to note', 'this function handles', 'various operations'. "
-            f"Do NOT mention specific variable names, numbers, or financial concepts. Keep it to 2 sentences.\n\n"
-            f"Question: {question}"
-        )
-        bad_answer = self._call_claude(bad_prompt, max_tokens=200)
         if not bad_answer:
             bad_answer = f"This code handles various operations related to {span.kind.replace('_', ' ')}."
 
@@ -141,13 +450,21 @@ class DatasetGenerator:
         if key in self.seen_keys:
             self.skipped += 1
             return None
+        cid = _span_cid(span, q_type)
+        minhash = _answer_minhash(good_answer)
+        if self.lsh.query(minhash):
+            self.skipped += 1
+            return None
         self.seen_keys.add(key)
+        if cid not in self.lsh:
+            self.lsh.insert(cid, minhash)
 
         meta = {
             "source_file": span.source_path.name,
-            "tags": span.metadata.get("tags", []),
+            "tags": span.tags,
             "question_type": q_type,
             "lines": f"{span.line_start}-{span.line_end}",
+            "cid": cid,
         }
 
         # --- SFT record ---
@@ -178,19 +495,31 @@ class DatasetGenerator:
         self.success += 1
         return {"sft": sft, "dpo": dpo, "grpo": grpo}
 
-    def generate_dataset(
+    async def generate_dataset(
         self,
         repo_path: Path,
         output_dir: Path,
         dataset_name: str = "country_factor",
         max_spans: int = 200,
+        clean: bool = False,
     ) -> Dict[str, Any]:
-        print(f"Parsing repository: {repo_path}")
-        documents = parse_repository(repo_path)
-        spans = [s for doc in documents for s in doc.spans]
+        # Fresh clients (and rate limiter lock) per call: each call may run on its own event
+        # loop, and a pool or lock from an earlier, closed loop can't be reused.
+        http = _http_client()
+        self.client = AsyncAnthropic(http_client=http)
+        self.openai = AsyncOpenAI(http_client=http) if self.semantic_cache else None
+        self.rate_limiter = RateLimiter(max_rpm=self.max_rpm, max_tpm=self.max_tpm)
+        try:
+            return await self._generate_dataset(repo_path, output_dir, dataset_name, max_spans, clean)
+        finally:
+            self.client = self.openai = None
+            await http.aclose()
 
-        tagger = OntologyTagger.default()
-        tagger.tag(spans)
+    async def _generate_dataset(
+        self, repo_path: Path, output_dir: Path, dataset_name: str, max_spans: int, clean: bool
+    ) -> Dict[str, Any]:
+        print(f"Parsing repository: {repo_path}")
+        spans = load_tagged_spans(repo_path, cache_dir=output_dir / ".cache" / "spans")
 
         # Filter to meaningful spans only
         meaningful = [
@@ -206,68 +535,113 @@ class DatasetGenerator:
             q_type, template = QUESTION_TEMPLATES[idx % len(QUESTION_TEMPLATES)]
             work.append((span, q_type, template))
 
-        print(f"Generating {len(work)} records across SFT / DPO / GRPO formats...")
-
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        # Open all output files upfront for incremental writing
+        # Resume: raw files from an interrupted run are kept; skip work items already written.
         raw_sft_path = output_dir / f"{dataset_name}_sft_raw.jsonl"
         raw_dpo_path = output_dir / f"{dataset_name}_dpo_raw.jsonl"
         raw_grpo_path = output_dir / f"{dataset_name}_grpo_raw.jsonl"
+        raw_paths = [raw_sft_path, raw_dpo_path, raw_grpo_path]
+        work_cids = {_span_cid(span, q_type) for span, q_type, _ in work}
+        done_cids, (sft_records, dpo_records, grpo_records) = _load_raw_records(raw_paths, work_cids)
+        # Each record is serialized once; the same JSONL line goes to its raw file and split file.
+        resumed_lines = [
+            [orjson.dumps(rec, option=orjson.OPT_APPEND_NEWLINE) for rec in records]
+            for records in (sft_records, dpo_records, grpo_records)
+        ]
+        if done_cids:
+            for rec in sft_records:
+                question, answer = rec["messages"][1]["content"], rec["messages"][2]["content"]
+                self.seen_keys.add(_dedup_key(question, answer))
+                cid = rec["metadata"]["cid"]
+                # MinHashLSH.insert raises on a key it already holds (e.g. a generator reused
+                # across runs, or a cid seen twice); the first answer stays indexed.
+                if cid not in self.lsh:
+                    self.lsh.insert(cid, _answer_minhash(answer))
+            work = [item for item in work if _span_cid(item[0], item[1]) not in done_cids]
+            print(f"Resuming: {len(done_cids)} records already generated, {len(work)} remaining")
+        if any(path.exists() for path in raw_paths):
+            # Rewrite the raws so torn, partial or stale records are not appended after.
+            for path, lines in zip(raw_paths, resumed_lines):
+                with open(path, "wb") as f:
+                    f.writelines(lines)
+
+        if self.use_batch:
+            print(f"Generating {len(work)} records across SFT / DPO / GRPO formats via the Message Batches API...")
+        else:
+            print(f"Generating {len(work)} records across SFT / DPO / GRPO formats "
+                  f"({self.concurrency} spans in flight)...")
 
-        sft_records: List[Dict] = []
-        dpo_records: List[Dict] = []
-        grpo_records: List[Dict] = []
-
-        with open(raw_sft_path, "w", encoding="utf-8") as f_sft, \
-             open(raw_dpo_path, "w", encoding="utf-8") as f_dpo, \
-             open(raw_grpo_path, "w", encoding="utf-8") as f_grpo:
-
-            for i, (span, q_type, template) in enumerate(work):
-                print(f"  [{i+1}/{len(work)}] {span.source_path.name} ({q_type})")
-                result = self.generate_for_span(span, q_type, template, repo_name=repo_path.name)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        if self.semantic_cache:
+            self.cache = SemanticCache(output_dir / ".cache", threshold=self.cache_threshold)
+            print(f"  Semantic cache: {len(self.cache.entries)} stored answers")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def process_span(span, q_type: str, template: str):
+            async with semaphore:
+                result = await self.generate_for_span(span, q_type, template, repo_name=repo_path.name)
+                return span, q_type, result
+
+        formats = ("sft", "dpo", "grpo")
+        stats: Dict[str, Any] = {fmt: {"total": 0, "train": 0, "valid": 0, "test": 0} for fmt in formats}
+
+        # Open all output files upfront; each record goes straight to its raw file and split file
+        with contextlib.ExitStack() as stack:
+            raw_files = {fmt: stack.enter_context(open(path, "ab")) for fmt, path in zip(formats, raw_paths)}
+            split_files = {
+                (fmt, split_name): stack.enter_context(
+                    open(output_dir / f"{dataset_name}_{fmt}_{split_name}.jsonl", "wb")
+                )
+                for fmt in formats
+                for split_name in ("train", "valid", "test")
+            }
+
+            def write_split(cid: str, lines: Dict[str, bytes]) -> None:
+                # All three formats of a span share a bucket so no prompt leaks across splits.
+                split_name = _split_bucket(cid)
+                for fmt in formats:
+                    split_files[fmt, split_name].write(lines[fmt])
+                    stats[fmt]["total"] += 1
+                    stats[fmt][split_name] += 1
+
+            for rec, *lines in zip(sft_records, *resumed_lines):
+                write_split(rec["metadata"]["cid"], dict(zip(formats, lines)))
+
+            if self.use_batch:
+                completed = iter(await self.generate_batch(work, repo_name=repo_path.name))
+            else:
+                completed = asyncio.as_completed(
+                    [process_span(span, q_type, template) for span, q_type, template in work]
+                )
+            for i, next_done in enumerate(completed):
+                span, q_type, result = next_done if self.use_batch else await next_done
                 if result:
-                    sft_records.append(result["sft"])
-                    dpo_records.append(result["dpo"])
-                    grpo_records.append(result["grpo"])
-                    f_sft.write(json.dumps(result["sft"], ensure_ascii=False) + "\n")
-                    f_dpo.write(json.dumps(result["dpo"], ensure_ascii=False) + "\n")
-                    f_grpo.write(json.dumps(result["grpo"], ensure_ascii=False) + "\n")
-                    f_sft.flush()
-                    f_dpo.flush()
-                    f_grpo.flush()
-                    print(f"    ✓ ({self.success} good, {self.skipped} skipped)")
-                else:
-                    print(f"    ✗ skipped")
-                time.sleep(0.3)
-
-        # Shuffle and split 90/5/5
-        def split(records):
-            random.shuffle(records)
-            n = len(records)
-            t = int(n * 0.90)
-            v = int(n * 0.95)
-            return records[:t], records[t:v], records[v:]
-
-        stats = {}
-        for fmt, records in [("sft", sft_records), ("dpo", dpo_records), ("grpo", grpo_records)]:
-            train, valid, test = split(list(records))
-            for split_name, split_records in [("train", train), ("valid", valid), ("test", test)]:
-                fname = output_dir / f"{dataset_name}_{fmt}_{split_name}.jsonl"
-                with open(fname, "w", encoding="utf-8") as f:
-                    for rec in split_records:
-                        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
-            stats[fmt] = {"total": len(records), "train": len(train), "valid": len(valid), "test": len(test)}
-
-        # Clean up raw files after successful split
-        for p in [raw_sft_path, raw_dpo_path, raw_grpo_path]:
-            p.unlink(missing_ok=True)
+                    lines = {fmt: orjson.dumps(result[fmt], option=orjson.OPT_APPEND_NEWLINE) for fmt in formats}
+                    for fmt in formats:
+                        raw_files[fmt].write(lines[fmt])
+                    write_split(result["sft"]["metadata"]["cid"], lines)
+                done = i + 1
+                if done % PROGRESS_EVERY == 0 or done == len(work):
+                    sys.stdout.write(
+                        f"  [{done}/{len(work)}] {self.success} good, {self.skipped} skipped"
+                        f" (last: {span.source_path.name} {q_type})\n"
+                    )
+                    sys.stdout.flush()
+
+        if self.cache is not None:
+            self.cache.save()
+
+        # Raw files stay as the resume point unless a clean finish is requested
+        if clean:
+            for p in raw_paths:
+                p.unlink(missing_ok=True)
 
         stats["success"] = self.success
         stats["skipped"] = self.skipped
+        stats["cache_hits"] = self.cache_hits
 
-        with open(output_dir / f"{dataset_name}_stats.json", "w") as f:
-            json.dump(stats, f, indent=2)
+        with open(output_dir / f"{dataset_name}_stats.json", "wb") as f:
+            f.write(orjson.dumps(stats, option=orjson.OPT_INDENT_2))
 
         return stats
 
@@ -280,6 +654,17 @@ if __name__ == "__main__":
     parser.add_argument("--out", default="./country_factor_output_final2", help="Output directory")
     parser.add_argument("--name", default="country_factor", help="Dataset name prefix")
     parser.add_argument("--max-spans", type=int, default=10000, help="Max spans to process")
+    parser.add_argument("--concurrency", type=int, default=16, help="Max spans processed concurrently")
+    parser.add_argument("--max-rpm", type=float, default=None, help="Claude requests-per-minute ceiling")
+    parser.add_argument("--max-tpm", type=float, default=None, help="Claude tokens-per-minute ceiling")
+    parser.add_argument("--no-batch", action="store_true",
+                        help="Call Claude live instead of through the Message Batches API")
+    parser.add_argument("--clean", action="store_true",
+                        help="Delete raw JSONL files after the split (disables resuming from them)")
+    parser.add_argument("--semantic-cache", action="store_true",
+                        help="Reuse answers for near-identical prompts (cached under <out>/.cache)")
+    parser.add_argument("--cache-threshold", type=float, default=0.93,
+                        help="Cosine similarity required for a semantic cache hit")
     args = parser.parse_args()
 
     repo_path = Path(args.repo)
@@ -288,13 +673,22 @@ if __name__ == "__main__":
         sys.exit(1)
 
     system_prompt = _make_system_prompt(repo_path.name)
-    gen = DatasetGenerator(system_prompt=system_prompt)
-    stats = gen.generate_dataset(
+    gen = DatasetGenerator(
+        system_prompt=system_prompt,
+        concurrency=args.concurrency,
+        max_rpm=args.max_rpm,
+        max_tpm=args.max_tpm,
+        use_batch=not args.no_batch,
+        semantic_cache=args.semantic_cache,
+        cache_threshold=args.cache_threshold,
+    )
+    stats = asyncio.run(gen.generate_dataset(
         repo_path=repo_path,
         output_dir=Path(args.out),
         dataset_name=args.name,
         max_spans=args.max_spans,
-    )
+        clean=args.clean,
+    ))
 
     print(f"\n✅ Done!")
     for fmt in ("sft", "dpo", "grpo"):
@@ -8,24 +8,63 @@ A robust web-based calculator with support for basic operations:
 - Clean, responsive UI
 """
 
-from flask import Flask, render_template, request, jsonify
+import os
+
+from flask import Flask, jsonify, render_template, request, session
 
 app = Flask(__name__)
+# Calculator state lives in the signed session cookie, so every worker needs the same key.
+app.secret_key = os.environ.get("CALCULATOR_SECRET_KEY")
+if not app.secret_key:
+    # A per-process random key only works with a single worker: under a multi-worker server,
+    # cookies signed by one worker are rejected by the others and the calculator resets.
+    app.logger.warning(
+        "CALCULATOR_SECRET_KEY is not set; using a random per-process key. "
+        "Set it when running more than one worker."
+    )
+    app.secret_key = os.urandom(32)
+
+# Internal op -> display symbol
+_OP_SYMBOLS = {"+": "+", "-": "−", "*": "×", "/": "÷"}
+
+
+def _fmt(num: float) -> str:
+    """Format a number for display: integers without a fraction, otherwise 10 significant digits."""
+    if num.is_integer():
+        return str(int(num))
+    # "g" already drops trailing fractional zeros; stripping "0" again would also
+    # eat exponent digits (1e-10 -> "1e-1").
+    return format(num, ".10g")
 
 
 class Calculator:
     """Calculator class managing state and operations."""
 
+    __slots__ = ("current_input", "stored_value", "pending_op", "last_action", "error", "display_expression")
+
     def __init__(self):
         """Initialize calculator with default state."""
         self.reset()
 
+    @classmethod
+    def from_state(cls, state: dict) -> "Calculator":
+        """Restore a calculator from a to_state() snapshot (missing keys keep defaults)."""
+        calc = cls()
+        for name in cls.__slots__:
+            if name in state:
+                setattr(calc, name, state[name])
+        return calc
+
+    def to_state(self) -> dict:
+        """Snapshot the calculator state as a JSON-serializable dict."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
     def reset(self):
         """Reset calculator to initial state."""
         self.current_input = "0"
         self.stored_value = None
         self.pending_op = None
-        self.last_action = clear
+        self.last_action = "clear"
         self.error = None
         self.display_expression = ""
 
@@ -98,12 +137,8 @@ class Calculator:
             if abs(result) > 1e100:
                 raise OverflowError("Result too large")
 
-            # Format result
-            if result.is_integer():
-                self.current_input = str(int(result))
-            else:
-                # Round to avoid floating point issues
-                self.current_input = f"{result:.10g}".rstrip("0").rstrip(".")
+            # Format result (10 significant digits to avoid floating point noise)
+            self.current_input = _fmt(result)
 
             op_symbol = self._get_op_symbol(self.pending_op)
             self.display_expression = (
@@ -164,12 +199,7 @@ class Calculator:
 
         try:
             value = float(self.current_input)
-            result = value / 100
-
-            if result.is_integer():
-                self.current_input = str(int(result))
-            else:
-                self.current_input = f"{result:.10g}".rstrip("0").rstrip(".")
+            self.current_input = _fmt(value / 100)
 
             self.last_action = "digit"
         except Exception:
@@ -191,32 +221,32 @@ class Calculator:
         Raises:
             ZeroDivisionError: If division by zero
         """
-        operations = {
-            "+": lambda x, y: x + y,
-            "-": lambda x, y: x - y,
-            "*": lambda x, y: x * y,
-            "/": lambda x, y: x / y if y != 0 else (_ for _ in ()).throw(ZeroDivisionError()),
-        }
-
-        return operations[op](a, b)
+        if op == "+":
+            return a + b
+        elif op == "-":
+            return a - b
+        elif op == "*":
+            return a * b
+        elif op == "/":
+            if b == 0:
+                raise ZeroDivisionError()
+            return a / b
+        raise KeyError(op)
 
     @staticmethod
     def _get_op_symbol(op: str) -> str:
         """Convert internal op symbol to display symbol."""
-        symbols = {"+": "+", "-": "−", "*": "×", "/": "÷"}
-        return symbols.get(op, op)
+        return _OP_SYMBOLS.get(op, op)
 
     @staticmethod
     def _format_number(num: float) -> str:
         """Format number for display."""
-        if num.is_integer():
-            return str(int(num))
-        else:
-            return f"{num:.10g}".rstrip("0").rstrip(".")
+        return _fmt(num)
 
 
-# Global calculator instance
-calculator = Calculator()
+def _session_calculator() -> Calculator:
+    """Load this client's calculator from the session (one per browser, no shared state)."""
+    return Calculator.from_state(session.get("calc_state", {}))
 
 
 @app.route("/")
@@ -245,6 +275,7 @@ def calculate():
         return jsonify({"error": "No data provided"}), 400
 
     action = data.get("action", "")
+    calculator = _session_calculator()
 
     if action == "digit":
         digit = data.get("value")
@@ -269,6 +300,7 @@ def calculate():
     else:
         return jsonify({"error": f"Unknown action: {action}"}), 400
 
+    session["calc_state"] = calculator.to_state()
     return jsonify(
         {
             "current_input": calculator.current_input,
@@ -281,7 +313,7 @@ def calculate():
 @app.route("/api/reset", methods=["POST"])
 def reset():
     """Reset calculator to initial state."""
-    calculator.reset()
+    session.pop("calc_state", None)
     return jsonify(
         {"current_input": "0", "display_expression": "", "error": None}
     )
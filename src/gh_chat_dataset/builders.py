@@ -1,7 +1,50 @@
+import re
 from typing import Dict, List, Optional
 
 from .tokenize_util import count_tokens_approx
 
+_WORD_RE = re.compile(r"\S+")
+
+# System prompts and instruction prefixes shared by every record of a task.
+_PY_SYSTEM = "You are a helpful Python assistant."
+_PY_PRECISE_SYSTEM = "You are a precise Python assistant."
+_JS_SYSTEM = "You are a helpful JavaScript assistant."
+_MD_SYSTEM = "You are a documentation assistant."
+_CONFIG_SYSTEM = "You are a configuration expert."
+_LOGGING_SYSTEM = "You are a logging expert."
+
+_PY_DOC_PROMPT = "Write a clear, concise docstring for the following Python code.\n\n"
+_JS_DOC_PROMPT = "Write a JSDoc comment for the following JavaScript/TypeScript function.\n\n"
+_VALIDATION_PROMPT = "What inputs are validated and how? Summarize from the code (asserts and raises).\n\n"
+_ERRORS_PROMPT = "Explain the error handling in this code. Which exceptions are caught and what happens?\n\n"
+_CONFIG_PROMPT = "Summarize the configuration constants defined in this module.\n\n"
+_LOGGING_PROMPT = "Describe the logging flow: logger names, levels, and key messages.\n\n"
+
+# One alternation per summary, scanned once over the whole buffer (see _matching_lines).
+_VALIDATION_RE = re.compile("|".join(map(re.escape, ("assert ", "raise ", "ValueError", "TypeError", "KeyError"))))
+_LOGGING_RE = re.compile(
+    "|".join(map(re.escape, ("logging.", ".debug(", ".info(", ".warning(", ".error(", ".exception(")))
+)
+# Line breaks other than '\n' that str.splitlines() also honours.
+_OTHER_BREAKS_RE = re.compile(r"[\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]")
+
+
+def _matching_lines(code: str, pattern: re.Pattern) -> List[str]:
+    """Lines of `code` (as str.splitlines() would split it) containing a match of `pattern`."""
+    if _OTHER_BREAKS_RE.search(code):
+        code = "\n".join(code.splitlines())
+    out: List[str] = []
+    pos = 0
+    while m := pattern.search(code, pos):
+        start = code.rfind("\n", 0, m.start()) + 1
+        end = code.find("\n", m.start())
+        if end < 0:
+            end = len(code)
+        out.append(code[start:end])
+        # Resume on the next line: each line is reported once however many markers it has.
+        pos = end + 1
+    return out
+
 
 def _to_chat(user: str, assistant: str, system: Optional[str] = None) -> Dict:
     msgs = []
@@ -21,9 +64,9 @@ def build_chat_from_py_docstring(item: Dict, meta: Dict, allow_llm: bool) -> Opt
             return None
         return None
     rec = _to_chat(
-        user="Write a clear, concise docstring for the following Python code.\n\n" + code,
+        user=_PY_DOC_PROMPT + code,
         assistant=doc,
-        system="You are a helpful Python assistant.",
+        system=_PY_SYSTEM,
     )
     rec["meta"] = {**meta, "task": "py_docstring_from_code", "source_type": "python"}
     return rec
@@ -37,27 +80,26 @@ def build_chat_from_js_jsdoc(item: Dict, meta: Dict, allow_llm: bool) -> Optiona
             return None
         return None
     rec = _to_chat(
-        user="Write a JSDoc comment for the following JavaScript/TypeScript function.\n\n" + code,
+        user=_JS_DOC_PROMPT + code,
         assistant=jsdoc,
-        system="You are a helpful JavaScript assistant.",
+        system=_JS_SYSTEM,
     )
     rec["meta"] = {**meta, "task": "js_jsdoc_from_code", "source_type": "javascript"}
     return rec
 
 
 def _window_text_by_tokens(text: str, window_tokens: int, overlap_tokens: int = 120) -> List[str]:
-    if not text.strip():
+    # Word spans as offsets; each window is one slice of the original text, not a re-join.
+    bounds = [m.span() for m in _WORD_RE.finditer(text)]
+    if not bounds:
         return []
-    words = text.split()
     # approximate: assume ~1 token ≈ 1 word for windowing granularity
     step = max(1, window_tokens - overlap_tokens)
+    last = len(bounds) - 1
     out: List[str] = []
     i = 0
-    while i < len(words):
-        chunk_words = words[i : i + window_tokens]
-        if not chunk_words:
-            break
-        out.append(" ".join(chunk_words))
+    while i < len(bounds):
+        out.append(text[bounds[i][0] : bounds[min(i + window_tokens - 1, last)][1]])
         i += step
         if len(out) > 32:  # safety cap
             break
@@ -90,7 +132,7 @@ def build_chats_from_md_section(
     for w in windows:
         for q in q_templates[: max_questions or 1]:
             prompt = q + "\n\n" + w
-            rec = _to_chat(user=prompt, assistant=w, system="You are a documentation assistant.")
+            rec = _to_chat(user=prompt, assistant=w, system=_MD_SYSTEM)
             rec["meta"] = {**meta, "task": "md_section_qa", "source_type": "markdown", "title": title}
             chats.append(rec)
     return chats
@@ -104,7 +146,7 @@ def build_chat_from_py_chunk(item: Dict, chunk_code: str, meta: Dict) -> Optiona
         f"Explain the following Python code chunk from {name}. Focus on what it does and why.\n\n" + chunk_code
     )
     assistant = chunk_code
-    rec = _to_chat(user=user, assistant=assistant, system="You are a helpful Python assistant.")
+    rec = _to_chat(user=user, assistant=assistant, system=_PY_SYSTEM)
     rec["meta"] = {**meta, "task": "py_chunk_explain", "source_type": "python", "name": name}
     return rec
 
@@ -112,16 +154,12 @@ def build_chat_from_py_chunk(item: Dict, chunk_code: str, meta: Dict) -> Optiona
 def build_validation_summary_py(code: str, meta: Dict) -> Optional[Dict]:
     if not code:
         return None
-    lines = [
-        ln
-        for ln in code.splitlines()
-        if any(k in ln for k in ["assert ", "raise ", "ValueError", "TypeError", "KeyError"])
-    ]
+    lines = _matching_lines(code, _VALIDATION_RE)
     if not lines:
         return None
-    user = "What inputs are validated and how? Summarize from the code (asserts and raises).\n\n" + code
+    user = _VALIDATION_PROMPT + code
     assistant = "\n".join(lines)
-    rec = _to_chat(user=user, assistant=assistant, system="You are a precise Python assistant.")
+    rec = _to_chat(user=user, assistant=assistant, system=_PY_PRECISE_SYSTEM)
     rec["meta"] = {**meta, "task": "py_validation_summary", "source_type": "python"}
     return rec
 
@@ -129,12 +167,12 @@ def build_validation_summary_py(code: str, meta: Dict) -> Optional[Dict]:
 def build_error_handling_summary_py(code: str, meta: Dict) -> Optional[Dict]:
     if not code:
         return None
-    lines = [ln for ln in code.splitlines() if ln.strip().startswith("except ") or ln.strip().startswith("try:")]
+    lines = [ln for ln in code.splitlines() if ln.strip().startswith(("except ", "try:"))]
     if not lines:
         return None
-    user = "Explain the error handling in this code. Which exceptions are caught and what happens?\n\n" + code
+    user = _ERRORS_PROMPT + code
     assistant = "\n".join(lines)
-    rec = _to_chat(user=user, assistant=assistant, system="You are a precise Python assistant.")
+    rec = _to_chat(user=user, assistant=assistant, system=_PY_PRECISE_SYSTEM)
     rec["meta"] = {**meta, "task": "py_error_handling_summary", "source_type": "python"}
     return rec
 
@@ -144,15 +182,17 @@ def build_config_constants_summary_py(code: str, meta: Dict) -> Optional[Dict]:
         return None
     const_lines: List[str] = []
     for ln in code.splitlines():
-        if "=" in ln and ln.strip() and ln.strip()[0].isalpha():
-            left = ln.split("=", 1)[0].strip()
-            if left.isupper() and " " not in left and not left.startswith("#"):
-                const_lines.append(ln.strip())
+        if "=" not in ln:
+            continue
+        stripped = ln.strip()
+        if stripped[0].isalpha():
+            left = stripped.split("=", 1)[0].rstrip()
+            if left.isupper() and " " not in left:
+                const_lines.append(stripped)
     if not const_lines:
         return None
-    user = "Summarize the configuration constants defined in this module.\n\n" + "\n".join(const_lines)
     assistant = "\n".join(const_lines)
-    rec = _to_chat(user=user, assistant=assistant, system="You are a configuration expert.")
+    rec = _to_chat(user=_CONFIG_PROMPT + assistant, assistant=assistant, system=_CONFIG_SYSTEM)
     rec["meta"] = {**meta, "task": "py_config_constants_summary", "source_type": "python"}
     return rec
 
@@ -160,15 +200,10 @@ def build_config_constants_summary_py(code: str, meta: Dict) -> Optional[Dict]:
 def build_logging_flow_summary_py(code: str, meta: Dict) -> Optional[Dict]:
     if not code:
         return None
-    log_lines = [
-        ln.strip()
-        for ln in code.splitlines()
-        if any(t in ln for t in ["logging.", ".debug(", ".info(", ".warning(", ".error(", ".exception("])
-    ]
+    log_lines = [ln.strip() for ln in _matching_lines(code, _LOGGING_RE)]
     if not log_lines:
         return None
-    user = "Describe the logging flow: logger names, levels, and key messages.\n\n" + "\n".join(log_lines)
     assistant = "\n".join(log_lines)
-    rec = _to_chat(user=user, assistant=assistant, system="You are a logging expert.")
+    rec = _to_chat(user=_LOGGING_PROMPT + assistant, assistant=assistant, system=_LOGGING_SYSTEM)
     rec["meta"] = {**meta, "task": "py_logging_flow_summary", "source_type": "python"}
     return rec
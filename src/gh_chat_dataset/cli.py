@@ -1,12 +1,18 @@
+import hashlib
 import json
-import random
+import os
+import re
 import shutil
 import subprocess
 import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import Callable, DefaultDict, Dict, Iterable, List, Optional, Tuple
 
 import click
+import numpy as np
+import orjson
 
 from .builders import (
     build_chat_from_js_jsdoc,
@@ -18,12 +24,11 @@ from .builders import (
     build_logging_flow_summary_py,
     build_validation_summary_py,
 )
-from .discover import discover_files
+from .discover import CODE_EXTS, discover_files
 from .extract_js import extract_js_items
 from .extract_md import split_markdown_sections
 from .extract_py import extract_python_items
-from .postprocess import dedupe_records, redact_secrets
-from .tokenize_util import count_tokens_approx
+from .postprocess import dedupe_records, record_token_totals, redact_secrets
 
 
 def run(cmd: List[str], cwd: Optional[str] = None) -> Tuple[int, str]:
@@ -31,8 +36,61 @@ def run(cmd: List[str], cwd: Optional[str] = None) -> Tuple[int, str]:
     return proc.returncode, (proc.stdout + proc.stderr)
 
 
+MIRROR_ROOT = Path.home() / ".cache" / "gh_chat_dataset" / "mirrors"
+
+
+def _mirror_path(repo_url: str) -> Path:
+    parts = [p for p in re.split(r"[/:]", repo_url.rstrip("/")) if p]
+    slug = "__".join(parts[-2:]).removesuffix(".git")
+    # owner__name alone is shared by the same path on different hosts; the URL hash is not.
+    digest = hashlib.sha1(repo_url.encode("utf-8")).hexdigest()[:12]
+    return MIRROR_ROOT / f"{re.sub(r'[^A-Za-z0-9._-]', '_', slug)}-{digest}.git"
+
+
+def _update_mirror(repo_url: str) -> Optional[Path]:
+    """Create or incrementally fetch a bare mirror of repo_url; None if that fails."""
+    mirror = _mirror_path(repo_url)
+    if mirror.exists():
+        code, origin = run(["git", "--git-dir", str(mirror), "config", "remote.origin.url"])
+        if code != 0 or origin.strip() != repo_url:
+            # Not a mirror of this URL: re-clone rather than build from another repo's code.
+            shutil.rmtree(mirror, ignore_errors=True)
+    if mirror.exists():
+        code, _ = run(["git", "--git-dir", str(mirror), "remote", "update", "--prune"])
+    else:
+        mirror.parent.mkdir(parents=True, exist_ok=True)
+        code, _ = run(["git", "clone", "--mirror", repo_url, str(mirror)])
+        if code != 0:
+            shutil.rmtree(mirror, ignore_errors=True)
+        else:
+            # Let blob-filtered clones of the mirror skip blobs outside the sparse checkout.
+            run(["git", "--git-dir", str(mirror), "config", "uploadpack.allowFilter", "true"])
+    return mirror if code == 0 else None
+
+
+def _sparse_clone(source: str, dest_dir: str) -> Tuple[int, str]:
+    """Shallow, blob-filtered clone that only checks out files with CODE_EXTS extensions."""
+    code, out = run(["git", "clone", "--depth=1", "--filter=blob:none", "--no-checkout", source, dest_dir])
+    if code == 0:
+        patterns = [f"*{ext}" for ext in sorted(CODE_EXTS)]
+        code, out = run(["git", "sparse-checkout", "set", "--no-cone", *patterns], cwd=dest_dir)
+    if code == 0:
+        # Blobs are fetched on demand here, and only for paths the patterns keep.
+        code, out = run(["git", "checkout"], cwd=dest_dir)
+    if code != 0:
+        shutil.rmtree(dest_dir, ignore_errors=True)
+    return code, out
+
+
 def shallow_clone(repo_url: str, dest_dir: str) -> Tuple[str, str]:
-    code, out = run(["git", "clone", "--depth=1", repo_url, dest_dir])
+    # Remote repos go through a persistent mirror so reruns only fetch new objects;
+    # the working copy is then a local shallow clone of the mirror.
+    mirror = None if Path(repo_url).exists() else _update_mirror(repo_url)
+    code = 1
+    if mirror:
+        code, out = _sparse_clone(mirror.as_uri(), dest_dir)
+    if code != 0:
+        code, out = _sparse_clone(repo_url, dest_dir)
     if code != 0:
         raise RuntimeError(f"git clone failed: {out}")
     code, sha = run(["git", "rev-parse", "HEAD"], cwd=dest_dir)
@@ -52,21 +110,29 @@ def to_messages(user: str, assistant: str, system: Optional[str] = None) -> Dict
 
 def _chunk_code_by_blanklines(code: str, min_lines: int, max_chunks: int) -> List[str]:
     lines = code.splitlines()
-    chunks: List[List[str]] = [[]]
-    for ln in lines:
-        if ln.strip() == "" and len(chunks[-1]) >= min_lines:
-            if chunks[-1]:
-                chunks.append([])
-            continue
-        chunks[-1].append(ln)
-    # finalize
-    parts = ["\n".join(c).strip() for c in chunks if len(c) >= min_lines]
-    if len(parts) > max_chunks:
-        parts = parts[:max_chunks]
+    # A blank line ends the current chunk once it has min_lines lines, so every chunk is a
+    # contiguous run lines[start:end]; track bounds instead of building per-chunk lists.
+    bounds: List[Tuple[int, int]] = []
+    start = 0
+    for i, ln in enumerate(lines):
+        if i - start >= min_lines and (not ln or ln.isspace()):
+            if i > start:
+                bounds.append((start, i))
+                if len(bounds) == max_chunks:
+                    break
+            start = i + 1
+    else:
+        bounds.append((start, len(lines)))
+    parts = ["\n".join(lines[s:e]).strip() for s, e in bounds if e - s >= min_lines][:max_chunks]
     return [p for p in parts if p]
 
 
-def build_records_for_repo(
+# Below this many files, process start-up costs more than parallel extraction saves.
+_PARALLEL_MIN_FILES = 8
+
+
+def _records_for_file(
+    path: Path,
     repo_path: Path,
     sha: str,
     allow_llm: bool,
@@ -79,57 +145,116 @@ def build_records_for_repo(
     include_errors: bool,
     include_config: bool,
     include_logging: bool,
-) -> Iterable[Dict]:
-    for path in discover_files(repo_path):
-        rel = path.relative_to(repo_path).as_posix()
-        meta = {"repo_path": str(repo_path), "path": rel, "sha": sha}
-        text = path.read_text(encoding="utf-8", errors="ignore")
-        if path.suffix == ".py":
-            for item in extract_python_items(rel, text):
-                # Primary docstring task
-                rec = build_chat_from_py_docstring(item, meta, allow_llm=allow_llm)
-                if rec:
-                    yield rec
-                # Optional chunked explanations
-                if py_chunking and item.get("code"):
-                    chunks = _chunk_code_by_blanklines(item["code"], py_chunk_min_lines, py_chunk_max)
-                    for ch in chunks:
-                        crec = build_chat_from_py_chunk(item, ch, meta)
-                        if crec:
-                            yield crec
-                # Additional deterministic tasks
-                code = item.get("code", "")
-                if include_validation:
-                    v = build_validation_summary_py(code, meta)
-                    if v:
-                        yield v
-                if include_errors:
-                    e = build_error_handling_summary_py(code, meta)
-                    if e:
-                        yield e
-                if include_logging:
-                    log_rec = build_logging_flow_summary_py(code, meta)
-                    if log_rec:
-                        yield log_rec
-        elif path.suffix in {".js", ".jsx", ".ts", ".tsx"}:
-            for item in extract_js_items(rel, text):
-                rec = build_chat_from_js_jsdoc(item, meta, allow_llm=allow_llm)
-                if rec:
-                    yield rec
-        elif path.suffix.lower() == ".md":
-            for sec in split_markdown_sections(text):
-                for rec in build_chats_from_md_section(
+) -> List[Dict]:
+    out: List[Dict] = []
+    rel = path.relative_to(repo_path).as_posix()
+    meta = {"repo_path": str(repo_path), "path": rel, "sha": sha}
+    text = path.read_text(encoding="utf-8", errors="ignore")
+    if path.suffix == ".py":
+        for item in extract_python_items(rel, text):
+            # Primary docstring task
+            rec = build_chat_from_py_docstring(item, meta, allow_llm=allow_llm)
+            if rec:
+                out.append(rec)
+            # Optional chunked explanations
+            if py_chunking and item.get("code"):
+                chunks = _chunk_code_by_blanklines(item["code"], py_chunk_min_lines, py_chunk_max)
+                for ch in chunks:
+                    crec = build_chat_from_py_chunk(item, ch, meta)
+                    if crec:
+                        out.append(crec)
+            # Additional deterministic tasks
+            code = item.get("code", "")
+            if include_validation:
+                v = build_validation_summary_py(code, meta)
+                if v:
+                    out.append(v)
+            if include_errors:
+                e = build_error_handling_summary_py(code, meta)
+                if e:
+                    out.append(e)
+            if include_logging:
+                log_rec = build_logging_flow_summary_py(code, meta)
+                if log_rec:
+                    out.append(log_rec)
+    elif path.suffix in {".js", ".jsx", ".ts", ".tsx"}:
+        for item in extract_js_items(rel, text):
+            rec = build_chat_from_js_jsdoc(item, meta, allow_llm=allow_llm)
+            if rec:
+                out.append(rec)
+    elif path.suffix.lower() == ".md":
+        for sec in split_markdown_sections(text):
+            out.extend(
+                build_chats_from_md_section(
                     sec,
                     meta,
                     max_questions=md_max_questions,
                     window_tokens=md_window_tokens,
-                ):
-                    yield rec
-        # Module-level constants summary (once per file for .py)
-        if path.suffix == ".py" and include_config:
-            c = build_config_constants_summary_py(text, meta)
-            if c:
-                yield c
+                )
+            )
+    # Module-level constants summary (once per file for .py)
+    if path.suffix == ".py" and include_config:
+        c = build_config_constants_summary_py(text, meta)
+        if c:
+            out.append(c)
+    return out
+
+
+def build_records_for_repo(
+    repo_path: Path,
+    sha: str,
+    allow_llm: bool,
+    md_max_questions: int,
+    md_window_tokens: int,
+    py_chunking: bool,
+    py_chunk_max: int,
+    py_chunk_min_lines: int,
+    include_validation: bool,
+    include_errors: bool,
+    include_config: bool,
+    include_logging: bool,
+    workers: Optional[int] = None,
+    file_progress: Optional[Callable[[int, int], None]] = None,
+) -> Iterable[Dict]:
+    extract = partial(
+        _records_for_file,
+        repo_path=repo_path,
+        sha=sha,
+        allow_llm=allow_llm,
+        md_max_questions=md_max_questions,
+        md_window_tokens=md_window_tokens,
+        py_chunking=py_chunking,
+        py_chunk_max=py_chunk_max,
+        py_chunk_min_lines=py_chunk_min_lines,
+        include_validation=include_validation,
+        include_errors=include_errors,
+        include_config=include_config,
+        include_logging=include_logging,
+    )
+    files = list(discover_files(repo_path))
+    workers = workers or os.cpu_count() or 1
+    # file_progress(done, total) fires about every 5% of files.
+    report_every = max(1, len(files) // 20)
+    if workers == 1 or len(files) < _PARALLEL_MIN_FILES:
+        results = map(extract, files)
+        yield from _with_file_progress(results, len(files), report_every, file_progress)
+        return
+    # Files are independent; map() keeps discovery order so output stays deterministic.
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        results = ex.map(extract, files, chunksize=max(1, len(files) // (workers * 4)))
+        yield from _with_file_progress(results, len(files), report_every, file_progress)
+
+
+def _with_file_progress(
+    results: Iterable[List[Dict]],
+    total: int,
+    report_every: int,
+    file_progress: Optional[Callable[[int, int], None]],
+) -> Iterable[Dict]:
+    for done, recs in enumerate(results, 1):
+        yield from recs
+        if file_progress and (done % report_every == 0 or done == total):
+            file_progress(done, total)
 
 
 def apply_filters(
@@ -137,43 +262,46 @@ def apply_filters(
     max_tokens: int,
     min_tokens: int,
     file_cap: int,
+    dedup_mode: str = "exact",
 ) -> List[Dict]:
+    redacted = [redact_secrets(r) for r in records]
+    # Token totals are kept on the record ("_tok_total") for stats and any re-filtering;
+    # write_jsonl drops underscore keys.
+    uncounted = [r for r in redacted if "_tok_total" not in r]
+    for r, total in zip(uncounted, record_token_totals(uncounted).tolist()):
+        r["_tok_total"] = total
+    totals = np.fromiter((r["_tok_total"] for r in redacted), dtype=np.int64, count=len(redacted))
+    in_budget = (totals >= min_tokens) & (totals <= max_tokens)
     out: List[Dict] = []
     per_file: DefaultDict[str, int] = DefaultDict(int)
-    for r in records:
-        r = redact_secrets(r)
-        total = 0
-        for m in r.get("messages", []):
-            c = m.get("content", "")
-            if isinstance(c, str):
-                total += count_tokens_approx(c)
-        if total < min_tokens:
-            continue
-        if total > max_tokens:
+    for r, keep in zip(redacted, in_budget.tolist()):
+        if not keep:
             continue
         p = r.get("meta", {}).get("path", "")
         if per_file[p] >= file_cap:
             continue
         per_file[p] += 1
         out.append(r)
-    return dedupe_records(out)
+    return dedupe_records(out, mode=dedup_mode)
 
 
 def train_valid_split(
     records: List[Dict], valid_ratio: float = 0.1, seed: int = 17
 ) -> Tuple[List[Dict], List[Dict]]:
-    rnd = random.Random(seed)
-    perm = records[:]
-    rnd.shuffle(perm)
-    n_valid = max(1, int(len(perm) * valid_ratio)) if perm else 0
-    return perm[n_valid:], perm[:n_valid]
+    # Shuffle an index array in C rather than copying and shuffling the record list.
+    order = np.random.default_rng(seed).permutation(len(records)).tolist()
+    n_valid = max(1, int(len(records) * valid_ratio)) if records else 0
+    return [records[i] for i in order[n_valid:]], [records[i] for i in order[:n_valid]]
 
 
 def write_jsonl(path: Path, rows: Iterable[Dict]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        for r in rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    # 1 MiB buffer: one write syscall per ~hundreds of records instead of per 8 KiB.
+    with path.open("wb", buffering=1 << 20) as f:
+        f.writelines(
+            orjson.dumps({k: v for k, v in r.items() if not k.startswith("_")}, option=orjson.OPT_APPEND_NEWLINE)
+            for r in rows
+        )
 
 
 def generate_dataset(
@@ -192,6 +320,8 @@ def generate_dataset(
     include_errors: bool,
     include_config: bool,
     include_logging: bool,
+    dedup_mode: str = "exact",
+    workers: Optional[int] = None,
     progress_cb: Optional[Callable[[str, int], None]] = None,
 ) -> Dict:
     """
@@ -213,6 +343,8 @@ def generate_dataset(
         include_errors: Include error handling summaries
         include_config: Include config summaries
         include_logging: Include logging summaries
+        dedup_mode: Duplicate removal: "exact", "minhash" or "lshbloom"
+        workers: Extraction processes (default: CPU count; 1 disables the pool)
         progress_cb: Optional callback(message, progress_percent)
 
     Returns:
@@ -235,7 +367,11 @@ def generate_dataset(
         if progress_cb:
             progress_cb("Building records from repository...", 20)
 
-        records_iter = build_records_for_repo(
+        def file_progress(done: int, total: int) -> None:
+            if progress_cb:
+                progress_cb(f"Extracted {done}/{total} files", 20 + 40 * done // total)
+
+        records = list(build_records_for_repo(
             Path(cloned),
             sha,
             allow_llm=allow_llm,
@@ -248,16 +384,19 @@ def generate_dataset(
             include_errors=include_errors,
             include_config=include_config,
             include_logging=include_logging,
-        )
+            workers=workers,
+            file_progress=file_progress,
+        ))
 
         if progress_cb:
             progress_cb("Filtering records...", 60)
 
         filtered = apply_filters(
-            records_iter,
+            records,
             max_tokens=max_tokens,
             min_tokens=min_tokens,
             file_cap=file_cap,
+            dedup_mode=dedup_mode,
         )
 
         if progress_cb:
@@ -276,8 +415,10 @@ def generate_dataset(
             "total": len(filtered),
             "train": len(train),
             "valid": len(valid),
+            "train_tokens": sum(r["_tok_total"] for r in train),
+            "valid_tokens": sum(r["_tok_total"] for r in valid),
         }
-        (outp / "stats.json").write_text(json.dumps(stats, indent=2), encoding="utf-8")
+        (outp / "stats.json").write_bytes(orjson.dumps(stats, option=orjson.OPT_INDENT_2))
 
         if progress_cb:
             progress_cb("Dataset generation complete!", 100)
@@ -303,6 +444,14 @@ def generate_dataset(
 @click.option("--include-errors/--no-include-errors", default=True, help="Add error handling summaries")
 @click.option("--include-config/--no-include-config", default=True, help="Add config constants summaries")
 @click.option("--include-logging/--no-include-logging", default=True, help="Add logging flow summaries")
+@click.option(
+    "--dedup-mode",
+    type=click.Choice(["exact", "minhash", "lshbloom"]),
+    default="exact",
+    show_default=True,
+    help="Duplicate removal: exact, MinHash+LSH near-duplicates, or Bloom-filter LSH (~19 bits/record/band)",
+)
+@click.option("--workers", type=int, default=None, help="Extraction processes (default: CPU count; 1 = serial)")
 def main(
     repo: str,
     out_dir: str,
@@ -319,6 +468,8 @@ def main(
     include_errors: bool,
     include_config: bool,
     include_logging: bool,
+    dedup_mode: str,
+    workers: Optional[int],
 ) -> None:
     result = generate_dataset(
         repo=repo,
@@ -336,6 +487,8 @@ def main(
         include_errors=include_errors,
         include_config=include_config,
         include_logging=include_logging,
+        dedup_mode=dedup_mode,
+        workers=workers,
         progress_cb=lambda msg, pct: None,  # No progress callback for CLI
     )
     click.echo(json.dumps(result))
@@ -1,16 +1,53 @@
+import os
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, List
 
 EXCLUDE_DIRS = {".git", "node_modules", "dist", "build", "venv", ".venv", "__pycache__"}
 CODE_EXTS = {".py", ".js", ".jsx", ".ts", ".tsx", ".md"}
+JS_EXTS = {".js", ".jsx", ".ts", ".tsx"}
+
+# Larger files are almost always generated or vendored, and only slow the extractors down.
+MAX_FILE_BYTES = 512_000
+SNIFF_BYTES = 4096
+# Bundled/minified JS packs whole programs onto a few lines.
+MINIFIED_AVG_LINE = 500
+
+
+def _looks_generated(path: str, ext: str) -> bool:
+    """True for binary content (NUL in the first 4KB) or minified JS/TS."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+    except OSError:
+        return True
+    if b"\0" in head:
+        return True
+    return ext in JS_EXTS and len(head) / (head.count(b"\n") + 1) > MINIFIED_AVG_LINE
 
 
 def discover_files(root: Path) -> Iterable[Path]:
-    for p in root.rglob("*"):
-        if p.is_dir():
-            if p.name in EXCLUDE_DIRS:
-                # skip walking inside excluded directories
-                yield from []
+    # Single scandir walk; excluded directories are pruned before descending into them.
+    found: List[str] = []
+    stack = [str(root)]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in EXCLUDE_DIRS:
+                            stack.append(entry.path)
+                        continue
+                    # Lowercased so README.MD and friends match CODE_EXTS.
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    if (
+                        ext in CODE_EXTS
+                        and entry.is_file()
+                        and entry.stat().st_size <= MAX_FILE_BYTES
+                        and not _looks_generated(entry.path, ext)
+                    ):
+                        found.append(entry.path)
+        except OSError:
             continue
-        if p.suffix in CODE_EXTS:
-            yield p
+    for path in sorted(found):
+        yield Path(path)
@@ -1,31 +1,55 @@
 import re
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, List, Optional
 
-JSDOC_RE = re.compile(r"/\*\*([\s\S]*?)\*/\s*(?:export\s+)?(?:async\s+)?function\s+([a-zA-Z0-9_$]+)\s*\(", re.MULTILINE)
-FUNC_RE = re.compile(r"(?:export\s+)?(?:async\s+)?function\s+([a-zA-Z0-9_$]+)\s*\([^)]*\)\s*{", re.MULTILINE)
+import numpy as np
+
+# The comment body may not contain "*/", so each "/**" only ever extends to its own end
+# instead of lazily retrying every later "*/" in the file (quadratic on comment-heavy files).
+# The match runs through the function header and stops at its "{" (lookahead), so one scan
+# yields the docs, the code start (group 2) and the body start (match end).
+JSDOC_RE = re.compile(
+    r"/\*\*((?:[^*]|\*(?!/))*)\*/\s*"
+    r"((?:export\s+)?(?:async\s+)?function\s+([a-zA-Z0-9_$]+)\s*\([^)]*\)\s*)(?=\{)",
+    re.MULTILINE,
+)
+
+
+class _BraceIndex:
+    """Vectorized brace matching for one file: built once, O(log n) lookup per block."""
+
+    def __init__(self, text: str) -> None:
+        # UTF-32 gives one element per code point, so indices line up with str indices.
+        chars = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        is_close = chars == ord("}")
+        self.depth = np.cumsum((chars == ord("{")).astype(np.int64) - is_close)
+        self.length = len(chars)
+        self.base = int(self.depth.min(initial=0))
+        # Closing braces keyed by (depth after the brace, position), sorted.
+        close_pos = np.flatnonzero(is_close)
+        self.stride = self.length + 1
+        self.close_keys = np.sort((self.depth[close_pos] - self.base) * self.stride + close_pos)
+
+    def block_end(self, body_start: int) -> int:
+        """Index just past the brace closing the block opened at body_start (or len if unclosed)."""
+        # Depth stays >= the opening level until the matching brace, the first later close
+        # that drops one level below it.
+        level = int(self.depth[body_start]) - 1 - self.base
+        idx = int(np.searchsorted(self.close_keys, level * self.stride + body_start))
+        if idx < len(self.close_keys) and self.close_keys[idx] // self.stride == level:
+            return int(self.close_keys[idx] % self.stride) + 1
+        return self.length
 
 
 def extract_js_items(path: str, text: str) -> Iterable[Dict]:
     items: List[Dict] = []
+    braces: Optional[_BraceIndex] = None
     for m in JSDOC_RE.finditer(text):
         jsdoc = m.group(1).strip()
-        name = m.group(2)
-        func_start = FUNC_RE.search(text, pos=m.start())
-        if not func_start:
-            continue
-        body_start = func_start.end() - 1
-        depth = 0
-        i = body_start
-        while i < len(text):
-            if text[i] == '{':
-                depth += 1
-            elif text[i] == '}':
-                depth -= 1
-                if depth == 0:
-                    i += 1
-                    break
-            i += 1
-        code = text[func_start.start():i]
+        name = m.group(3)
+        if braces is None:
+            braces = _BraceIndex(text)
+        end = braces.block_end(m.end())
+        code = text[m.start(2):end]
         items.append({
             "kind": "Function",
             "name": name,
@@ -1,23 +1,26 @@
 import re
 from typing import Dict, List
 
+# ATX heading line: 1-6 '#' then whitespace. [^\S\n] keeps the match on one line.
+_HEADING_RE = re.compile(r"^#{1,6}[^\S\n].*$", re.MULTILINE)
+# Line breaks other than '\n' that str.splitlines() also honours.
+_OTHER_BREAKS_RE = re.compile(r"[\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]")
+
 
 def split_markdown_sections(text: str) -> List[Dict]:
+    if _OTHER_BREAKS_RE.search(text):
+        text = "\n".join(text.splitlines())
     sections: List[Dict] = []
-    current = {"title": "", "content": []}
-    for line in text.splitlines():
-        if re.match(r"^#{1,6}\s", line):
-            if current["content"]:
-                sections.append({
-                    "title": current["title"],
-                    "content": "\n".join(current["content"]).strip(),
-                })
-            current = {"title": line.lstrip("# ").strip(), "content": []}
-        else:
-            current["content"].append(line)
-    if current["content"]:
-        sections.append({
-            "title": current["title"],
-            "content": "\n".join(current["content"]).strip(),
-        })
-    return [s for s in sections if s["content"]]
+    title = ""
+    start = 0
+    # One anchored scan over the whole buffer; section bodies are sliced from the original text.
+    for m in _HEADING_RE.finditer(text):
+        content = text[start:m.start()].strip()
+        if content:
+            sections.append({"title": title, "content": content})
+        title = m.group().lstrip("# ").strip()
+        start = m.end() + 1
+    content = text[start:].strip()
+    if content:
+        sections.append({"title": title, "content": content})
+    return sections
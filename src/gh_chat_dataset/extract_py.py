@@ -1,19 +1,57 @@
 import ast
-from typing import Dict, Iterable, List
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from itertools import accumulate
+from typing import Callable, Dict, Iterable, List, Tuple
 
+# Statement-list fields, in ast._fields order. Definitions only ever appear in these
+# lists, so expression subtrees (most of a module's nodes) are never visited.
+_BLOCK_FIELDS = ("body", "handlers", "orelse", "finalbody", "cases")
 
-def extract_python_items(path: str, text: str) -> Iterable[Dict]:
+# Line breaks other than '\n' that str.splitlines() honours; such files keep the join path.
+_OTHER_BREAKS = ("\r", "\x0b", "\x0c", "\x1c", "\x1d", "\x1e", "\x85", "\u2028", "\u2029")
+
+# Extracted items per (path, content digest), so rebuilds over unchanged files skip ast.parse.
+# Stored as columns (kinds, names, docstrings, codes), not one dict per item.
+_CACHE_SIZE = 1024
+_FIELDS = ("kind", "name", "docstring", "code")
+_cache: "OrderedDict[Tuple[str, bytes], Tuple[tuple, ...]]" = OrderedDict()
+# The webapp extracts on worker threads; OrderedDict reordering/eviction is not thread-safe.
+_cache_lock = threading.Lock()
+
+
+def _segmenter(text: str) -> Callable[[int, int], str]:
+    """Return f(start, end) giving 0-based lines [start, end) joined with newlines."""
+    if any(ch in text for ch in _OTHER_BREAKS):
+        lines = text.splitlines()
+        return lambda start, end: "\n".join(lines[start:end])
+
+    # Slice the original string via line start offsets instead of split + join.
+    starts = [0, *accumulate(len(line) + 1 for line in text.split("\n"))]
+    n_lines = len(starts) - 2 if text.endswith("\n") else len(starts) - 1
+
+    def segment(start: int, end: int) -> str:
+        end = min(end, n_lines)
+        if start >= end:
+            return ""
+        return text[starts[start]:starts[end] - 1]
+
+    return segment
+
+
+def _extract(path: str, text: str) -> List[Dict]:
     items: List[Dict] = []
     try:
         tree = ast.parse(text)
     except Exception:
         return items
-    lines = text.splitlines()
+    lines = _segmenter(text)
 
     def segment(node: ast.AST) -> str:
         start = getattr(node, "lineno", 1) - 1
         end = getattr(node, "end_lineno", start + 1)
-        return "\n".join(lines[start:end])
+        return lines(start, end)
 
     # module docstring
     mod_doc = ast.get_docstring(tree) or ""
@@ -26,7 +64,14 @@ def extract_python_items(path: str, text: str) -> Iterable[Dict]:
             "path": path,
         })
 
-    for node in ast.walk(tree):
+    # Breadth-first like ast.walk (same item order), but restricted to statement blocks.
+    queue = deque(tree.body)
+    while queue:
+        node = queue.popleft()
+        for field in _BLOCK_FIELDS:
+            block = getattr(node, field, None)
+            if block:
+                queue.extend(block)
         if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
             doc = ast.get_docstring(node) or ""
             code = segment(node)
@@ -39,3 +84,25 @@ def extract_python_items(path: str, text: str) -> Iterable[Dict]:
                 "path": path,
             })
     return items
+
+
+def extract_python_items(path: str, text: str) -> Iterable[Dict]:
+    key = (path, hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest())
+    with _cache_lock:
+        columns = _cache.get(key)
+        if columns is not None:
+            _cache.move_to_end(key)
+    if columns is None:
+        # Parsed outside the lock; two threads may both extract a file, with the same result.
+        items = _extract(path, text)
+        columns = tuple(tuple(item[f] for item in items) for f in _FIELDS)
+        with _cache_lock:
+            _cache[key] = columns
+            if len(_cache) > _CACHE_SIZE:
+                _cache.popitem(last=False)
+        return items
+    # Fresh dicts per call, so callers can't mutate cached items.
+    return [
+        {"kind": kind, "name": name, "docstring": doc, "code": code, "path": path}
+        for kind, name, doc, code in zip(*columns)
+    ]
@@ -0,0 +1,22 @@
+import hashlib
+from pathlib import Path
+from typing import Iterable, Iterator
+
+
+def digest128(parts: Iterable[bytes]) -> bytes:
+    """128-bit content digest (truncated SHA-256) of the concatenated parts (dedup keys, ETags)."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part)
+    return h.digest()[:16]
+
+
+def _read_chunks(path: Path, chunk_size: int = 1 << 20) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+def file_digest128(path: Path) -> bytes:
+    """digest128 of a file's contents, read in 1 MiB chunks."""
+    return digest128(_read_chunks(path))
@@ -1,4 +1,17 @@
-from typing import Callable, Dict, List, Tuple
+import math
+import re
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Literal, Set, Tuple
+
+import numpy as np
+from datasketch import MinHash, MinHashLSH
+from scipy.integrate import quad
+
+from .hash_util import digest128
+
+DedupMode = Literal["exact", "minhash", "lshbloom"]
+
+_TOKEN_RE = re.compile(r"\S+")
 
 
 def redact_secrets(record: Dict) -> Dict:
@@ -15,18 +28,125 @@ def within_budget(record: Dict, max_tokens: int, tokenizer: Callable[[str], int]
     return total <= max_tokens
 
 
-def dedupe_records(records: List[Dict]) -> List[Dict]:
-    seen = set()
+def record_token_totals(records: List[Dict]) -> np.ndarray:
+    """Approximate token count per record, i.e. count_tokens_approx summed over string contents."""
+    lens: List[int] = []
+    owners: List[int] = []
+    for i, r in enumerate(records):
+        for m in r.get("messages", []):
+            c = m.get("content", "")
+            if isinstance(c, str):
+                lens.append(len(c))
+                owners.append(i)
+    per_message = np.maximum(np.array(lens, dtype=np.int64) // 4, 1)
+    # bincount rather than add.reduceat: records without string content must sum to 0.
+    totals = np.bincount(np.array(owners, dtype=np.int64), weights=per_message, minlength=len(records))
+    return totals.astype(np.int64)
+
+
+def _record_minhash(record: Dict, num_perm: int, k: int = 5) -> MinHash:
+    text = "\n".join(
+        f"{m.get('role')}: {m.get('content')}" for m in record.get("messages", []) if isinstance(m, dict)
+    )
+    tokens = _TOKEN_RE.findall(text)
+    shingles = {" ".join(tokens[i:i + k]).encode("utf-8") for i in range(max(1, len(tokens) - k + 1))}
+    m = MinHash(num_perm=num_perm)
+    m.update_batch(list(shingles))
+    return m
+
+
+@lru_cache(maxsize=None)
+def _lsh_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bands, rows) minimizing false positive + false negative area, as MinHashLSH picks them."""
+
+    def error(bands: int, rows: int) -> float:
+        false_pos = quad(lambda s: 1 - (1 - s ** rows) ** bands, 0.0, threshold)[0]
+        false_neg = quad(lambda s: (1 - s ** rows) ** bands, threshold, 1.0)[0]
+        return 0.5 * false_pos + 0.5 * false_neg
+
+    pairs = ((b, r) for b in range(1, num_perm + 1) for r in range(1, num_perm // b + 1))
+    return min(pairs, key=lambda pair: error(*pair))
+
+
+class _BloomFilter:
+    """Fixed-size Bloom filter over byte keys, sized for `capacity` items at `error_rate`."""
+
+    def __init__(self, capacity: int, error_rate: float = 1e-4) -> None:
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.size / capacity * math.log(2)))
+        # Packed: one bit per slot (~19 bits per item at the default error rate).
+        self.bits = bytearray(self.size // 8 + 1)
+
+    def _positions(self, key: bytes) -> List[int]:
+        # Kirsch-Mitzenmacher double hashing from one 128-bit digest.
+        digest = digest128((key,))
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.num_hashes)]
+
+    def add_if_absent(self, key: bytes) -> bool:
+        """Insert key; return True if it was (probably) already present."""
+        present = True
+        for pos in self._positions(key):
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not self.bits[byte] & mask:
+                present = False
+                self.bits[byte] |= mask
+        return present
+
+
+def _near_dup_filter(records: List[Dict], mode: DedupMode, threshold: float, num_perm: int) -> List[Dict]:
+    out: List[Dict] = []
+    if mode == "minhash":
+        lsh = MinHashLSH(threshold=threshold, num_perm=num_perm)
+        for i, r in enumerate(records):
+            m = _record_minhash(r, num_perm)
+            if lsh.query(m):
+                continue
+            lsh.insert(str(i), m)
+            out.append(r)
+        return out
+
+    # LSHBloom: same banding as MinHashLSH, but each band's buckets live in a Bloom filter
+    # instead of a hash table: ~19 bits per record per band.
+    bands, rows = _lsh_bands(threshold, num_perm)
+    blooms = [_BloomFilter(len(records)) for _ in range(bands)]
+    for r in records:
+        hashes = _record_minhash(r, num_perm).hashvalues
+        keys = [hashes[b * rows:(b + 1) * rows].tobytes() for b in range(bands)]
+        # Check every band before inserting so one record can't match itself.
+        seen = [bloom.add_if_absent(key) for bloom, key in zip(blooms, keys)]
+        if not any(seen):
+            out.append(r)
+    return out
+
+
+def _record_digest(record: Dict) -> bytes:
+    # \x00 / \x01 separate role, content and turns so boundaries can't shift.
+    return digest128(
+        f"{m.get('role')}\x00{m.get('content')}\x01".encode("utf-8", "surrogatepass")
+        for m in record.get("messages", [])
+        if isinstance(m, dict)
+    )
+
+
+def dedupe_records(
+    records: Iterable[Dict],
+    mode: DedupMode = "exact",
+    threshold: float = 0.85,
+    num_perm: int = 128,
+) -> List[Dict]:
+    # 16-byte digests rather than (role, content) tuples: `seen` stays small however long the turns.
+    seen: Set[bytes] = set()
     out: List[Dict] = []
     for r in records:
-        msgs = r.get("messages", [])
-        key: Tuple = tuple(
-            (m.get("role"), m.get("content"))
-            for m in msgs
-            if isinstance(m, dict)
-        )
+        key = _record_digest(r)
         if key in seen:
             continue
         seen.add(key)
         out.append(r)
+    if mode != "exact":
+        # Exact duplicates are removed first; MinHash then catches whitespace/comment drift.
+        out = _near_dup_filter(out, mode, threshold, num_perm)
     return out
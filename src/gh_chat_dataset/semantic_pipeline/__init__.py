@@ -7,6 +7,7 @@ from .cluster import ClusteringConfig, SemanticClusterer
 from .synthesizer import SemanticSynthesizer
 from .writer import SemanticWriter
 from .pipeline import run_semantic_pipeline
+from .response_cache import SemanticCache
 
 __all__ = [
     "parse_repository",
@@ -17,4 +18,5 @@ __all__ = [
     "SemanticSynthesizer",
     "SemanticWriter",
     "run_semantic_pipeline",
+    "SemanticCache",
 ]
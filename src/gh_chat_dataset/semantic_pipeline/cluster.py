@@ -11,12 +11,15 @@ OUTPUT FILES:
 
 VERSION HISTORY:
 - v1.0 (2025-09-28): Initial HDBSCAN + FAISS clustering implementation.
+- v1.1 (2025-10-05): faiss.normalize_L2; sparse FAISS HNSW k-NN graph into HDBSCAN for large inputs.
 
-LAST UPDATED: 2025-09-28
+LAST UPDATED: 2025-10-05
 
 NOTES:
 - Uses FAISS for nearest-neighbor indexing and HDBSCAN for density-based clustering.
 - Falls back to singletons when clusters cannot be formed.
+- From `knn_graph_min_points` spans on, HDBSCAN runs on a precomputed sparse k-NN distance graph
+  (one run per connected component) instead of all pairwise distances.
 =============================================================================
 """
 
@@ -28,6 +31,8 @@ from typing import Dict, Iterable, List, Sequence
 import faiss
 import numpy as np
 from hdbscan import HDBSCAN
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
 
 from ..semantic_types import Cluster, Span
 
@@ -38,6 +43,8 @@ class ClusteringConfig:
     min_samples: int = 3
     metric: str = "euclidean"
     faiss_nprobe: int = 10
+    knn_graph_min_points: int = 50_000
+    knn_neighbors: int = 32
 
 
 class SemanticClusterer:
@@ -62,7 +69,7 @@ class SemanticClusterer:
         for label, indices in clusters.items():
             cluster_spans = [spans[i] for i in indices]
             centroid = normalized[indices].mean(axis=0).tolist()
-            ontology_tags = sorted({tag for span in cluster_spans for tag in (span.metadata.get("tags", []) or [])})
+            ontology_tags = sorted({tag for span in cluster_spans for tag in span.tags})
             if label == -1:
                 for span_index in indices:
                     singleton_counter += 1
@@ -71,7 +78,7 @@ class SemanticClusterer:
                         Cluster(
                             cluster_id=f"singleton-{singleton_counter}",
                             spans=[span],
-                            ontology_tags=span.metadata.get("tags", []),
+                            ontology_tags=span.tags,
                             centroid=normalized[span_index].tolist(),
                         )
                     )
@@ -87,14 +94,55 @@ class SemanticClusterer:
         return records
 
     def _normalize(self, embeddings: np.ndarray) -> np.ndarray:
-        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-        norms[norms == 0.0] = 1.0
-        return embeddings / norms
+        # Copy (callers keep their matrix); normalize_L2 works in place and leaves zero rows as zeros.
+        normalized = np.array(embeddings, dtype=np.float32, order="C")
+        faiss.normalize_L2(normalized)
+        return normalized
 
     def _run_hdbscan(self, vectors: np.ndarray) -> np.ndarray:
-        reducer = HDBSCAN(
-            min_cluster_size=self.config.min_cluster_size,
-            min_samples=self.config.min_samples,
-            metric=self.config.metric,
-        )
-        return reducer.fit_predict(vectors)
+        if len(vectors) < self.config.knn_graph_min_points:
+            reducer = HDBSCAN(
+                min_cluster_size=self.config.min_cluster_size,
+                min_samples=self.config.min_samples,
+                metric=self.config.metric,
+            )
+            return reducer.fit_predict(vectors)
+        return self._run_hdbscan_knn(vectors)
+
+    def _run_hdbscan_knn(self, vectors: np.ndarray) -> np.ndarray:
+        """HDBSCAN over a sparse HNSW k-NN graph: O(N*k) edges instead of O(N^2) distances."""
+        n, dim = vectors.shape
+        k = min(self.config.knn_neighbors, n - 1)
+        index = faiss.IndexHNSWFlat(dim, 32)
+        index.add(vectors)
+        sq_dists, neighbors = index.search(vectors, k + 1)
+
+        rows = np.repeat(np.arange(n), k + 1)
+        cols = neighbors.ravel()
+        # Drop self matches and missing results; keep exact duplicates as (tiny) edges.
+        keep = (cols >= 0) & (cols != rows)
+        dists = np.maximum(np.sqrt(np.maximum(sq_dists.ravel()[keep], 0.0)), 1e-12)
+        graph = csr_matrix((dists, (rows[keep], cols[keep])), shape=(n, n))
+        graph = graph.maximum(graph.T).tocsr()
+
+        # HDBSCAN rejects disconnected sparse graphs, so cluster each component on its own.
+        labels = np.full(n, -1, dtype=np.int64)
+        n_components, component = connected_components(graph, directed=False)
+        next_label = 0
+        for c in range(n_components):
+            members = np.flatnonzero(component == c)
+            if len(members) < max(self.config.min_cluster_size, self.config.min_samples + 1):
+                continue
+            # With several components each one is a child of the (unselectable) root, as in a full
+            # run, so it may come back as a single cluster; a lone component is the root itself.
+            reducer = HDBSCAN(
+                min_cluster_size=self.config.min_cluster_size,
+                min_samples=self.config.min_samples,
+                metric="precomputed",
+                allow_single_cluster=n_components > 1,
+            )
+            sub = reducer.fit_predict(graph[members][:, members])
+            clustered = sub >= 0
+            labels[members[clustered]] = sub[clustered] + next_label
+            next_label += int(sub.max()) + 1 if clustered.any() else 0
+        return labels
@@ -7,82 +7,141 @@ INPUT FILES:
 - Parsed and tagged spans (in-memory structures, no direct file IO).
 
 OUTPUT FILES:
-- None written directly. Returns embedding vectors for downstream clustering.
+- <cache_dir>/embeddings.i8: Append-only int8 matrix of cached vectors (when caching).
+- <cache_dir>/embeddings.i8.sqlite: Span key -> row index into embeddings.i8 and its dequantization scale.
 
 VERSION HISTORY:
 - v1.0 (2025-09-28): Initial OpenAI + optional cache implementation.
+- v1.1 (2025-10-02): Send missing spans in fixed-size request batches.
+- v1.2 (2025-10-05): Memory-mapped vector file + SQLite index instead of one JSON file per span.
+- v1.3 (2025-10-06): Cache vectors as int8 with a per-row scale (4x smaller on disk and in page cache).
+- v1.4 (2025-10-07): Send request batches concurrently through AsyncOpenAI (bounded by max_concurrency).
+- v1.5 (2025-10-08): Open the AsyncOpenAI client per embed_spans call (its pool is bound to that event loop).
 
-LAST UPDATED: 2025-09-28
+LAST UPDATED: 2025-10-08
 
 NOTES:
 - Uses OpenAI text-embedding-3-large by default.
-- Supports local caching to minimize repeated API calls.
-- Designed for batch operations for efficiency.
+- Supports local caching to minimize repeated API calls; cache keys cover model, span location
+  and content, so edited spans are re-embedded.
+- Cached vectors are symmetric int8 quantized (scale = max|x| / 127); cosine neighbourhoods are
+  preserved, and clustering re-normalizes anyway.
+- Designed for batch operations for efficiency; up to `max_concurrency` requests are in flight,
+  and each batch is cached as soon as its response arrives.
 =============================================================================
 """
 
 from __future__ import annotations
 
-import json
+import asyncio
+import hashlib
+import sqlite3
 from pathlib import Path
-from typing import List, Optional, Sequence, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 from ..semantic_types import Span
 
+EMBED_DIM = 3072
+# SQLite's default bound-parameter limit is 999 on older builds.
+LOOKUP_CHUNK = 500
+
 
 class OpenAIEmbedder:
     def __init__(
         self,
         model: str = "text-embedding-3-large",
         cache_dir: Optional[Path] = None,
+        batch_size: int = 128,
+        max_concurrency: int = 8,
     ) -> None:
-        self.client = OpenAI()
         self.model = model
+        # Inputs per embeddings request; one oversized request can exceed the API's 2048-input limit.
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
         self.cache_dir = cache_dir
+        self._db: Optional[sqlite3.Connection] = None
         if self.cache_dir:
             self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._vectors_path = self.cache_dir / "embeddings.i8"
+            self._db = sqlite3.connect(self.cache_dir / "embeddings.i8.sqlite")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS idx (key TEXT PRIMARY KEY, row INTEGER NOT NULL, scale REAL NOT NULL)"
+            )
 
     def embed_spans(self, spans: Sequence[Span]) -> np.ndarray:
         texts = [span.content for span in spans]
         if self.cache_dir:
             embeddings, missing_indices = self._load_cached(spans)
         else:
-            embeddings = np.zeros((len(spans), 3072), dtype=np.float32)
+            embeddings = np.zeros((len(spans), EMBED_DIM), dtype=np.float32)
             missing_indices = list(range(len(spans)))
 
         if missing_indices:
-            batch = [texts[i] for i in missing_indices]
-            response = self.client.embeddings.create(model=self.model, input=batch)
-            for idx, embedding in zip(missing_indices, response.data):
-                embeddings[idx] = np.array(embedding.embedding, dtype=np.float32)
-                if self.cache_dir:
-                    self._write_cache(spans[idx], embeddings[idx])
+            asyncio.run(self._embed_missing(spans, texts, missing_indices, embeddings))
         return embeddings
 
-    def _cache_path(self, span: Span) -> Path:
-        name = f"{span.source_path.as_posix()}:{span.line_start}-{span.line_end}".replace("/", "_")
-        return self.cache_dir / f"{hash(name)}.json"
+    async def _embed_missing(
+        self, spans: Sequence[Span], texts: List[str], missing_indices: List[int], embeddings: np.ndarray
+    ) -> None:
+        # Overlap request round-trips; everything below runs on the event loop thread, so
+        # the embeddings array and the SQLite connection are never touched concurrently.
+        sem = asyncio.Semaphore(self.max_concurrency)
+
+        async def one(client: AsyncOpenAI, chunk: List[int]) -> None:
+            async with sem:
+                response = await client.embeddings.create(model=self.model, input=[texts[i] for i in chunk])
+            for embedding in response.data:
+                embeddings[chunk[embedding.index]] = np.array(embedding.embedding, dtype=np.float32)
+            if self.cache_dir:
+                self._write_cache([spans[i] for i in chunk], embeddings[chunk])
+
+        chunks = [
+            missing_indices[start:start + self.batch_size]
+            for start in range(0, len(missing_indices), self.batch_size)
+        ]
+        # A client per call: its connection pool belongs to this asyncio.run loop, which is
+        # closed by the time a later embed_spans call starts its own.
+        async with AsyncOpenAI() as client:
+            await asyncio.gather(*(one(client, chunk) for chunk in chunks))
+
+    def _cache_key(self, span: Span) -> str:
+        digest = hashlib.blake2b(span.content.encode("utf-8"), digest_size=16).hexdigest()
+        return f"{self.model}:{span.source_path.as_posix()}:{span.line_start}-{span.line_end}:{digest}"
 
     def _load_cached(self, spans: Sequence[Span]) -> Tuple[np.ndarray, List[int]]:
-        embeddings = np.zeros((len(spans), 3072), dtype=np.float32)
-        missing: List[int] = []
-        for i, span in enumerate(spans):
-            path = self._cache_path(span)
-            if path.exists():
-                data = json.loads(path.read_text())
-                embeddings[i] = np.array(data["embedding"], dtype=np.float32)
-            else:
-                missing.append(i)
+        embeddings = np.zeros((len(spans), EMBED_DIM), dtype=np.float32)
+        keys = [self._cache_key(span) for span in spans]
+        rows: Dict[str, Tuple[int, float]] = {}
+        for start in range(0, len(keys), LOOKUP_CHUNK):
+            chunk = keys[start:start + LOOKUP_CHUNK]
+            query = f"SELECT key, row, scale FROM idx WHERE key IN ({','.join('?' * len(chunk))})"
+            rows.update((key, (row, scale)) for key, row, scale in self._db.execute(query, chunk))
+        present = [i for i, key in enumerate(keys) if key in rows]
+        if present:
+            n_rows = self._vectors_path.stat().st_size // EMBED_DIM
+            vectors = np.memmap(self._vectors_path, dtype=np.int8, mode="r", shape=(n_rows, EMBED_DIM))
+            row_ids, scales = zip(*(rows[keys[i]] for i in present))
+            embeddings[present] = vectors[list(row_ids)] * np.array(scales, dtype=np.float32)[:, None]
+        missing = [i for i, key in enumerate(keys) if key not in rows]
         return embeddings, missing
 
-    def _write_cache(self, span: Span, vector: np.ndarray) -> None:
-        path = self._cache_path(span)
-        payload = {
-            "embedding": vector.tolist(),
-            "source": span.source_path.as_posix(),
-            "lines": [span.line_start, span.line_end],
-        }
-        path.write_text(json.dumps(payload), encoding="utf-8")
+    def _write_cache(self, spans: Sequence[Span], vectors: np.ndarray) -> None:
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0.0] = 1.0
+        quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+        row_bytes = EMBED_DIM
+        with open(self._vectors_path, "ab") as f:
+            first_row, torn = divmod(f.tell(), row_bytes)
+            if torn:
+                # Partial row from an interrupted append; it was never indexed.
+                f.truncate(first_row * row_bytes)
+            f.write(quantized.tobytes())
+        # One commit per request batch, after the vectors are written.
+        self._db.executemany(
+            "INSERT OR REPLACE INTO idx (key, row, scale) VALUES (?, ?, ?)",
+            [(self._cache_key(span), first_row + i, float(scales[i])) for i, span in enumerate(spans)],
+        )
+        self._db.commit()
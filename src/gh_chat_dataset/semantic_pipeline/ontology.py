@@ -59,9 +59,8 @@ class OntologyTagger:
             if span.kind == "module_constant":
                 tags.add("config")
             tagged_tags = sorted(tags)
-            span.metadata.setdefault("tags", [])
             for tag in tagged_tags:
-                if tag not in span.metadata["tags"]:
-                    span.metadata["tags"].append(tag)
+                if tag not in span.tags:
+                    span.tags.append(tag)
             tagged_results.append(tagged_tags)
         return tagged_results
@@ -11,39 +11,63 @@ OUTPUT FILES:
 
 VERSION HISTORY:
 - v1.0 (2025-09-28): Initial extraction utilities for semantic pipeline.
+- v1.1 (2025-10-07): def/class lines detected by prefix test instead of per-line regex.
+- v1.2 (2025-10-07): Markdown parsed block-level only (inline tokenization skipped).
+- v1.3 (2025-10-07): Files parsed across a process pool (`workers`).
+- v1.4 (2025-10-07): Files found via `discover_files` (pruned scandir walk, size cap, generated-file skip).
+- v1.5 (2025-10-07): Block-end scan short-circuits space-indented body lines.
+- v1.6 (2025-10-08): Markdown suffix matched case-insensitively again (README.MD, .Md).
 
-LAST UPDATED: 2025-09-28
+LAST UPDATED: 2025-10-08
 
 NOTES:
 - Uses tree-sitter grammars for structural parsing of Python modules.
 - Markdown parsing relies on `markdown-it-py` for section-level segmentation.
+- Files come from `discover.discover_files`, so vendored/build directories, oversized files and
+  minified or binary content are skipped the same way as in the main dataset builder.
+- Files are independent, so `parse_repository` fans them out over processes; document order
+  follows the sorted path list either way.
 =============================================================================
 """
 
 from __future__ import annotations
 
-import re
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, List, Optional
 
 from markdown_it import MarkdownIt
 
+from ..discover import discover_files
 from ..semantic_types import ParsedDocument, Span
 
 # Simplified parser without tree-sitter for now
 _PY_PARSER = None
 
-_MD = MarkdownIt()
+# Bump whenever span extraction changes so cached span lists are invalidated.
+PARSER_VERSION = "4"
 
+# Sections only need heading_open tokens and their line maps, which come from the block
+# pass; skipping inline tokenization halves parse time without moving any heading.
+_MD = MarkdownIt().disable("inline")
 
-def parse_repository(repo_path: Path) -> List[ParsedDocument]:
-    documents: List[ParsedDocument] = []
-    for path in sorted(repo_path.rglob("*")):
-        if path.suffix == ".py":
-            documents.append(_parse_python(path))
-        elif path.suffix.lower() == ".md":
-            documents.append(_parse_markdown(path))
-    return documents
+
+# Below this many files, process start-up costs more than parallel parsing saves.
+_PARALLEL_MIN_FILES = 8
+
+
+def parse_repository(repo_path: Path, workers: Optional[int] = None) -> List[ParsedDocument]:
+    paths = [p for p in discover_files(repo_path) if p.suffix == ".py" or p.suffix.lower() == ".md"]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) < _PARALLEL_MIN_FILES:
+        return [_parse_file(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(_parse_file, paths, chunksize=max(1, len(paths) // (workers * 4))))
+
+
+def _parse_file(path: Path) -> ParsedDocument:
+    return _parse_python(path) if path.suffix == ".py" else _parse_markdown(path)
 
 
 def _get_module_docstring(text: str) -> str:
@@ -78,13 +102,14 @@ def _find_block_end(lines: List[str], start_idx: int) -> int:
     if start_idx >= len(lines):
         return start_idx
     base_indent = _get_indent_level(lines[start_idx])
+    # More than base_indent leading spaces settles most body lines without the per-char count.
+    deeper = " " * (base_indent + 1)
     end_idx = start_idx
     for j in range(start_idx + 1, len(lines)):
         line = lines[j]
-        stripped = line.strip()
-        if not stripped:
+        if not line or line.isspace():
             continue
-        if _get_indent_level(line) > base_indent:
+        if line.startswith(deeper) or _get_indent_level(line) > base_indent:
             end_idx = j
         else:
             break
@@ -104,9 +129,11 @@ def _parse_python(path: Path) -> ParsedDocument:
     while i < len(lines):
         line = lines[i]
         stripped = line.strip()
+        # Only spaces/tabs may precede the keyword, hence lstrip(" \t") rather than stripped.
+        head = line.lstrip(" \t")
 
         # Function definitions (top-level or class methods)
-        if re.match(r"^[ \t]*def ", line) and "(" in stripped:
+        if head.startswith("def ") and "(" in stripped:
             end_idx = _find_block_end(lines, i)
             content = "\n".join(lines[i : end_idx + 1])
             if len(content.strip()) >= MIN_CONTENT_CHARS:
@@ -120,14 +147,14 @@ def _parse_python(path: Path) -> ParsedDocument:
                         content=full_content,
                         line_start=i + 1,
                         line_end=end_idx + 1,
-                        metadata={"name": stripped.split("(")[0].replace("def ", "").strip()},
+                        name=stripped.split("(")[0].replace("def ", "").strip(),
                     )
                 )
             i = end_idx + 1
             continue
 
         # Class definitions
-        elif re.match(r"^[ \t]*class ", line) and ":" in stripped:
+        elif head.startswith("class ") and ":" in stripped:
             end_idx = _find_block_end(lines, i)
             content = "\n".join(lines[i : end_idx + 1])
             if len(content.strip()) >= MIN_CONTENT_CHARS:
@@ -141,7 +168,7 @@ def _parse_python(path: Path) -> ParsedDocument:
                         content=full_content,
                         line_start=i + 1,
                         line_end=end_idx + 1,
-                        metadata={"name": stripped.split("(")[0].replace("class ", "").rstrip(":").strip()},
+                        name=stripped.split("(")[0].replace("class ", "").rstrip(":").strip(),
                     )
                 )
             i = end_idx + 1
@@ -174,7 +201,7 @@ def _parse_markdown(path: Path) -> ParsedDocument:
                         content=section_text,
                         line_start=section_start,
                         line_end=section_end,
-                        metadata={"title": current_title},
+                        title=current_title,
                     )
                 )
             stack = stack[: level - 1]
@@ -190,7 +217,7 @@ def _parse_markdown(path: Path) -> ParsedDocument:
             content=section_text,
             line_start=section_start,
             line_end=section_end,
-            metadata={"title": current_title},
+            title=current_title,
         )
     )
 
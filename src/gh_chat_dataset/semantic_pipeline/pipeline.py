@@ -11,8 +11,10 @@ OUTPUT FILES:
 
 VERSION HISTORY:
 - v1.0 (2025-09-28): Initial orchestration of semantic pipeline stages.
+- v1.1 (2025-10-03): Reuse cached parse + tag results per commit.
+- v1.2 (2025-10-07): Share cache_dir with the synthesizer's critique cache.
 
-LAST UPDATED: 2025-09-28
+LAST UPDATED: 2025-10-07
 
 NOTES:
 - Orchestrates parsing, tagging, embedding, clustering, LLM synthesis, and serialization.
@@ -23,13 +25,12 @@ NOTES:
 from __future__ import annotations
 
 from pathlib import Path
-from typing import List
 
-from ..semantic_types import ConversationRecord, ParsedDocument, Span
+from ..semantic_types import ConversationRecord
 from .cluster import ClusteringConfig, SemanticClusterer
 from .embedder import OpenAIEmbedder
 from .ontology import OntologyTagger
-from .parser import parse_repository
+from .span_cache import load_tagged_spans
 from .synthesizer import SemanticSynthesizer
 from .writer import SemanticWriter
 
@@ -49,24 +50,18 @@ class SemanticPipeline:
         self.synthesizer = SemanticSynthesizer(
             claude_model=claude_model,
             openai_model=openai_model,
+            cache_dir=cache_dir,
         )
 
     def run(self, repo_path: Path, output_dir: Path) -> None:
-        documents = parse_repository(repo_path)
-        spans = self._collect_spans(documents)
-        self.tagger.tag(spans)
+        span_cache = self.cache_dir / "spans" if self.cache_dir else None
+        spans = load_tagged_spans(repo_path, cache_dir=span_cache, tagger=self.tagger)
         embeddings = self.embedder.embed_spans(spans)
         clusters = self.clusterer.cluster(spans, embeddings)
         conversations = self.synthesizer.generate(clusters)
         writer = SemanticWriter(output_dir)
         writer.write(conversations)
 
-    def _collect_spans(self, documents: List[ParsedDocument]) -> List[Span]:
-        spans: List[Span] = []
-        for doc in documents:
-            spans.extend(doc.spans)
-        return spans
-
 
 def run_semantic_pipeline(
     repo_path: Path,
@@ -0,0 +1,97 @@
+"""
+=============================================================================
+SCRIPT NAME: response_cache.py
+=============================================================================
+
+INPUT FILES:
+- <cache_dir>/responses.faiss: FAISS inner-product index of prompt embeddings.
+- <cache_dir>/responses.jsonl: One entry per index row (prompt hash, answer, metadata).
+
+OUTPUT FILES:
+- Same files as above, rewritten by `SemanticCache.save`.
+
+VERSION HISTORY:
+- v1.0 (2025-10-02): Initial exact + FAISS semantic response cache.
+
+LAST UPDATED: 2025-10-02
+
+NOTES:
+- Exact SHA256(prompt) lookups are checked first and need no embedding.
+- Semantic hits require cosine similarity >= threshold over L2-normalized vectors.
+=============================================================================
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import faiss
+import numpy as np
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class SemanticCache:
+    def __init__(self, cache_dir: Path, threshold: float = 0.93, dim: int = 1536) -> None:
+        self.cache_dir = cache_dir
+        self.threshold = threshold
+        self.index = faiss.IndexFlatIP(dim)
+        self.entries: List[Dict[str, Any]] = []
+        self.exact: Dict[str, str] = {}
+        self._load()
+
+    @property
+    def _index_path(self) -> Path:
+        return self.cache_dir / "responses.faiss"
+
+    @property
+    def _entries_path(self) -> Path:
+        return self.cache_dir / "responses.jsonl"
+
+    def _load(self) -> None:
+        if not (self._index_path.exists() and self._entries_path.exists()):
+            return
+        index = faiss.read_index(str(self._index_path))
+        with self._entries_path.open("r", encoding="utf-8") as fh:
+            entries = [json.loads(line) for line in fh if line.strip()]
+        if index.ntotal != len(entries) or index.d != self.index.d:
+            # Sidecar and index disagree (interrupted save); start fresh rather than misalign answers.
+            return
+        self.index = index
+        self.entries = entries
+        self.exact = {entry["key"]: entry["answer"] for entry in entries}
+
+    @staticmethod
+    def _normalize(vector: Any) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(vec)
+        return vec
+
+    def get_exact(self, prompt: str) -> Optional[str]:
+        return self.exact.get(prompt_key(prompt))
+
+    def search(self, vector: Any) -> Optional[str]:
+        if self.index.ntotal == 0:
+            return None
+        scores, ids = self.index.search(self._normalize(vector), 1)
+        if ids[0][0] < 0 or scores[0][0] < self.threshold:
+            return None
+        return self.entries[ids[0][0]]["answer"]
+
+    def add(self, prompt: str, vector: Any, answer: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        key = prompt_key(prompt)
+        self.exact[key] = answer
+        self.index.add(self._normalize(vector))
+        self.entries.append({"key": key, "answer": answer, "metadata": metadata or {}})
+
+    def save(self) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        faiss.write_index(self.index, str(self._index_path))
+        with self._entries_path.open("w", encoding="utf-8") as fh:
+            for entry in self.entries:
+                fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
@@ -0,0 +1,79 @@
+"""
+=============================================================================
+SCRIPT NAME: span_cache.py
+=============================================================================
+
+INPUT FILES:
+- Repository working tree (parsed via `parse_repository` on a cache miss).
+- <cache_dir>/<key>.msgpack: Previously parsed and tagged spans.
+
+OUTPUT FILES:
+- <cache_dir>/<key>.msgpack: Parsed and tagged spans for the current commit.
+
+VERSION HISTORY:
+- v1.0 (2025-10-03): Initial on-disk memoization of parse + ontology tagging.
+- v1.1 (2025-10-04): msgpack span dicts instead of pickle (faster, no code execution on load).
+
+LAST UPDATED: 2025-10-04
+
+NOTES:
+- Key covers the resolved repo path, git HEAD sha, PARSER_VERSION and the tagger keyword map.
+- Repos that are not git checkouts, or have uncommitted changes, are parsed fresh every time.
+=============================================================================
+"""
+
+from __future__ import annotations
+
+import hashlib
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+
+import msgpack
+
+from ..semantic_types import Span
+from .ontology import OntologyTagger
+from .parser import PARSER_VERSION, parse_repository
+
+
+def _git_head(repo_path: Path) -> Optional[str]:
+    """Return HEAD sha for a clean checkout, or None when spans can't be keyed reliably."""
+    try:
+        head = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=repo_path, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain"], cwd=repo_path, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return None if dirty else head
+
+
+def _cache_key(repo_path: Path, sha: str, tagger: OntologyTagger) -> str:
+    rules = sorted((tag, sorted(keywords)) for tag, keywords in tagger.keyword_map.items())
+    raw = f"{repo_path.resolve()}:{sha}:{PARSER_VERSION}:{rules}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def load_tagged_spans(
+    repo_path: Path,
+    cache_dir: Optional[Path] = None,
+    tagger: Optional[OntologyTagger] = None,
+) -> List[Span]:
+    """Parse and tag every span in `repo_path`, reusing a cached result for the same commit."""
+    tagger = tagger or OntologyTagger.default()
+    sha = _git_head(repo_path) if cache_dir else None
+    cache_path = cache_dir / f"{_cache_key(repo_path, sha, tagger)}.msgpack" if sha else None
+    if cache_path and cache_path.exists():
+        try:
+            return [Span.from_dict(d) for d in msgpack.unpackb(cache_path.read_bytes(), raw=False)]
+        except (ValueError, KeyError, TypeError):
+            pass
+
+    spans = [span for doc in parse_repository(repo_path) for span in doc.spans]
+    tagger.tag(spans)
+    if cache_path:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_bytes(msgpack.packb([span.to_dict() for span in spans]))
+    return spans
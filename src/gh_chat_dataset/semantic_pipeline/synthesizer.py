@@ -8,29 +8,74 @@ INPUT FILES:
 
 OUTPUT FILES:
 - None written directly. Generates `ConversationRecord` instances for serialization.
+- <cache_dir>/critiques.sqlite: OpenAI critiques keyed by model + prompt hash (when caching).
 
 VERSION HISTORY:
 - v1.0 (2025-09-28): Initial Anthropic + OpenAI synthesis implementation.
+- v1.1 (2025-10-03): Structured output via forced tool use instead of free-text JSON parsing.
+- v1.2 (2025-10-07): Clusters synthesized concurrently via the async clients (bounded by max_concurrency).
+- v1.3 (2025-10-07): Critiques cached by (model, prompt) hash in <cache_dir>/critiques.sqlite.
+- v1.4 (2025-10-08): Async clients opened per generate() call (their pools are bound to that event loop).
+- v1.5 (2025-10-08): Claude call drops `temperature`, which the current anthropic SDK rejects.
 
-LAST UPDATED: 2025-09-28
+LAST UPDATED: 2025-10-08
 
 NOTES:
 - Uses Anthropic Claude for primary conversation generation.
 - Uses OpenAI GPT for critique/quality review.
 - Requires `ANTHROPIC_API_KEY` and `OPENAI_API_KEY` environment variables.
+- Up to `max_concurrency` clusters are in flight at once; output keeps cluster order.
 =============================================================================
 """
 
 from __future__ import annotations
 
+import asyncio
 import json
+import sqlite3
 import uuid
-from typing import Iterable, List, Sequence
-
-from anthropic import Anthropic
-from openai import OpenAI
-
-from ..semantic_types import ConversationRecord, ConversationTurn, Span
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+
+from anthropic import AsyncAnthropic
+from openai import AsyncOpenAI
+
+from ..semantic_types import Cluster, ConversationRecord, ConversationTurn, Span
+from .response_cache import prompt_key
+
+# Forced tool call: Claude returns the conversation as already-parsed tool input.
+EMIT_CONVERSATION_TOOL = {
+    "name": "emit_conversation",
+    "description": "Emit the generated multi-turn conversation grounded in the provided context.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "conversation_id": {"type": "string"},
+            "turns": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "role": {"type": "string", "enum": ["user", "assistant"]},
+                        "content": {"type": "string"},
+                        "evidence": {"type": "array", "items": {"type": "object"}},
+                        "metadata": {"type": "object"},
+                    },
+                    "required": ["role", "content"],
+                },
+            },
+            "summary": {
+                "type": "object",
+                "properties": {
+                    "bullet_points": {"type": "array", "items": {"type": "string"}},
+                    "data_quality": {"type": "string"},
+                    "risk_notes": {"type": "string"},
+                },
+            },
+        },
+        "required": ["turns", "summary"],
+    },
+}
 
 
 class SemanticSynthesizer:
@@ -39,26 +84,47 @@ class SemanticSynthesizer:
         claude_model: str = "anthropic.claude-opus-4-6-v1",
         openai_model: str = "gpt-4.1-mini",
         max_tokens: int = 1800,
+        max_concurrency: int = 8,
+        cache_dir: Optional[Path] = None,
     ) -> None:
-        self.anthropic = Anthropic()
-        self.openai = OpenAI()
         self.claude_model = claude_model
         self.openai_model = openai_model
         self.max_tokens = max_tokens
+        self.max_concurrency = max_concurrency
+        # Critiques run at temperature 0, so reruns over the same conversation can reuse them.
+        self._critiques: Optional[sqlite3.Connection] = None
+        if cache_dir:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            self._critiques = sqlite3.connect(cache_dir / "critiques.sqlite")
+            self._critiques.execute(
+                "CREATE TABLE IF NOT EXISTS critiques (key TEXT PRIMARY KEY, critique TEXT NOT NULL)"
+            )
 
-    def generate(self, clusters: Sequence["Cluster"]) -> List[ConversationRecord]:
-        conversations: List[ConversationRecord] = []
-        for cluster in clusters:
-            try:
-                record = self._generate_for_cluster(cluster)
-                if record:
-                    conversations.append(record)
-            except Exception as exc:  # pragma: no cover - resilience for API noise
-                # In production we would log and continue; here we skip on failure
-                continue
-        return conversations
-
-    def _generate_for_cluster(self, cluster: "Cluster") -> ConversationRecord | None:
+    def generate(self, clusters: Sequence[Cluster]) -> List[ConversationRecord]:
+        records = asyncio.run(self._generate_all(clusters))
+        return [record for record in records if record]
+
+    async def _generate_all(self, clusters: Sequence[Cluster]) -> List[ConversationRecord | None]:
+        # Each cluster is two dependent round-trips (generate, then critique); overlapping
+        # clusters hides that latency. gather() returns results in cluster order.
+        sem = asyncio.Semaphore(self.max_concurrency)
+
+        async def one(anthropic: AsyncAnthropic, openai: AsyncOpenAI, cluster: Cluster) -> ConversationRecord | None:
+            async with sem:
+                try:
+                    return await self._generate_for_cluster(anthropic, openai, cluster)
+                except Exception:  # pragma: no cover - resilience for API noise
+                    # In production we would log and continue; here we skip on failure
+                    return None
+
+        # Clients per call: their connection pools belong to this asyncio.run loop, which is
+        # closed by the time a later generate() call starts its own.
+        async with AsyncAnthropic() as anthropic, AsyncOpenAI() as openai:
+            return await asyncio.gather(*(one(anthropic, openai, cluster) for cluster in clusters))
+
+    async def _generate_for_cluster(
+        self, anthropic: AsyncAnthropic, openai: AsyncOpenAI, cluster: Cluster
+    ) -> ConversationRecord | None:
         context = self._build_context(cluster.spans)
         system_prompt = (
             "You are a finance-focused AI documentation expert. "
@@ -67,20 +133,20 @@ class SemanticSynthesizer:
             "Always cite evidence using file paths and line ranges."
         )
         user_prompt = (
-            "Create a JSON object with keys: conversation_id, turns (list of {role, content, evidence, metadata}), "
+            "Call emit_conversation with conversation_id, turns (list of {role, content, evidence, metadata}), "
             "summary (with keys bullet_points, data_quality, risk_notes). Use the provided context strictly.\n\n"
             f"Context:\n{context}"
         )
-        response = self.anthropic.messages.create(
+        response = await anthropic.messages.create(
             model=self.claude_model,
             max_tokens=self.max_tokens,
-            temperature=0.2,
             system=system_prompt,
             messages=[{"role": "user", "content": user_prompt}],
+            tools=[EMIT_CONVERSATION_TOOL],
+            tool_choice={"type": "tool", "name": EMIT_CONVERSATION_TOOL["name"]},
         )
-        text = "".join(block.text for block in response.content if hasattr(block, "text"))
-        data = self._parse_json(text)
-        if not data:
+        data = next((block.input for block in response.content if block.type == "tool_use"), None)
+        if not data or not data.get("turns"):
             return None
 
         conversation_id = data.get("conversation_id") or f"cluster-{uuid.uuid4()}"
@@ -97,7 +163,7 @@ class SemanticSynthesizer:
                 )
             )
 
-        critique = self._critique_conversation(text)
+        critique = await self._critique_conversation(openai, json.dumps(data, ensure_ascii=False))
 
         source_files = sorted({span.source_path.as_posix() for span in cluster.spans})
         ontology_tags = list(cluster.ontology_tags)
@@ -114,7 +180,7 @@ class SemanticSynthesizer:
     def _build_context(self, spans: Sequence[Span]) -> str:
         pieces: List[str] = []
         for idx, span in enumerate(spans, start=1):
-            tags = ", ".join(span.metadata.get("tags", [])) or "none"
+            tags = ", ".join(span.tags) or "none"
             piece = (
                 f"Span {idx}:\n"
                 f"Path: {span.source_path.as_posix()}\n"
@@ -125,27 +191,25 @@ class SemanticSynthesizer:
             pieces.append(piece)
         return "\n".join(pieces)
 
-    def _parse_json(self, text: str) -> dict | None:
-        try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            try:
-                start = text.index("{")
-                end = text.rindex("}") + 1
-                return json.loads(text[start:end])
-            except Exception:
-                return None
-
-    def _critique_conversation(self, conversation_json: str) -> str:
+    async def _critique_conversation(self, openai: AsyncOpenAI, conversation_json: str) -> str:
         prompt = (
             "Review the following JSON conversation for factual accuracy and clarity. "
             "Respond with concise critique (or 'OK' if solid).\n\n"
             f"{conversation_json}"
         )
-        response = self.openai.chat.completions.create(
+        key = prompt_key(f"{self.openai_model}\x00{prompt}")
+        if self._critiques:
+            row = self._critiques.execute("SELECT critique FROM critiques WHERE key = ?", (key,)).fetchone()
+            if row:
+                return row[0]
+        response = await openai.chat.completions.create(
             model=self.openai_model,
             messages=[{"role": "user", "content": prompt}],
             temperature=0,
             max_tokens=400,
         )
-        return response.choices[0].message.content or ""
+        critique = response.choices[0].message.content or ""
+        if self._critiques:
+            self._critiques.execute("INSERT OR REPLACE INTO critiques (key, critique) VALUES (?, ?)", (key, critique))
+            self._critiques.commit()
+        return critique
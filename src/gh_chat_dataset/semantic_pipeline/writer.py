@@ -13,8 +13,9 @@ OUTPUT FILES:
 
 VERSION HISTORY:
 - v1.0 (2025-09-28): Initial serializer for semantic dataset output.
+- v1.1 (2025-10-07): orjson serialization into buffered binary files.
 
-LAST UPDATED: 2025-09-28
+LAST UPDATED: 2025-10-07
 
 NOTES:
 - Responsible for train/valid split and JSONL serialization.
@@ -24,10 +25,12 @@ NOTES:
 
 from __future__ import annotations
 
-import json
+from collections import defaultdict
 from pathlib import Path
 from typing import Dict, Iterable, Iterator, List, Sequence
 
+import orjson
+
 from ..semantic_types import ConversationRecord, Span
 
 
@@ -53,12 +56,11 @@ class SemanticWriter:
             "train": len(train),
             "valid": len(valid),
         }
-        stats_path.write_text(json.dumps(stats, indent=2), encoding="utf-8")
+        stats_path.write_bytes(orjson.dumps(stats, option=orjson.OPT_INDENT_2))
 
     def _write_jsonl(self, path: Path, records: Sequence[ConversationRecord]) -> None:
-        with path.open("w", encoding="utf-8") as f:
-            for record in records:
-                f.write(json.dumps(self._to_dict(record), ensure_ascii=False) + "\n")
+        with path.open("wb", buffering=1 << 20) as f:
+            f.writelines(orjson.dumps(self._to_dict(record), option=orjson.OPT_APPEND_NEWLINE) for record in records)
 
     def _split(
         self, records: Sequence[ConversationRecord], valid_ratio: float = 0.1
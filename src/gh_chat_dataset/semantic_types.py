@@ -11,8 +11,9 @@ OUTPUT FILES:
 
 VERSION HISTORY:
 - v1.0 (2025-09-28): Initial introduction of semantic dataset dataclasses.
+- v1.1 (2025-10-07): Span name/title/tags as slot fields instead of a metadata dict.
 
-LAST UPDATED: 2025-09-28
+LAST UPDATED: 2025-10-07
 
 NOTES:
 - Provides strongly typed containers used across the semantic pipeline.
@@ -24,7 +25,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Sequence
+from typing import Any, Dict, List, Optional, Sequence
 
 
 @dataclass(slots=True)
@@ -36,7 +37,35 @@ class Span:
     content: str
     line_start: int
     line_end: int
-    metadata: Dict[str, str] = field(default_factory=dict)
+    # The only per-span attributes the pipeline uses; slots rather than a dict per span.
+    name: Optional[str] = None
+    title: Optional[str] = None
+    tags: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "source_path": self.source_path.as_posix(),
+            "kind": self.kind,
+            "content": self.content,
+            "line_start": self.line_start,
+            "line_end": self.line_end,
+            "name": self.name,
+            "title": self.title,
+            "tags": self.tags,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Span":
+        return cls(
+            source_path=Path(data["source_path"]),
+            kind=data["kind"],
+            content=data["content"],
+            line_start=data["line_start"],
+            line_end=data["line_end"],
+            name=data.get("name"),
+            title=data.get("title"),
+            tags=data.get("tags", []),
+        )
 
 
 @dataclass(slots=True)
@@ -9,7 +9,10 @@ import time
 import uuid
 from collections import deque
 from datetime import datetime
-from typing import Dict, List, Optional, TypedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, TypedDict
+
+from ..hash_util import file_digest128
 
 
 class JobState(TypedDict):
@@ -17,17 +20,24 @@ class JobState(TypedDict):
     job_id: str
     state: str  # queued, running, done, error
     progress: int  # 0-100
-    logs: List[str]
+    logs: Sequence[str]  # bounded deque in _jobs; list in get_job/list_jobs snapshots
     result: Optional[Dict]
     error_message: Optional[str]
     created_at: str
     completed_at: Optional[str]
+    logs_total: int  # lines ever logged; `logs` holds the last _MAX_LOGS of them
+    version: int  # bumped on every change; the status endpoint's ETag
 
 
 # In-memory job storage
 _jobs: Dict[str, JobState] = {}
 _jobs_lock = threading.Lock()
+# Signalled (under _jobs_lock) whenever any job's version changes; wakes long-polls.
+_jobs_changed = threading.Condition(_jobs_lock)
 _MAX_LOGS = 200
+# stats.json bytes per finished job, read once at completion: it is small and fetched
+# repeatedly (preview + download). Kept out of JobState so status responses stay JSON.
+_stats_bytes: Dict[str, bytes] = {}
 
 
 def create_job(repo_url: str, output_dir: str, options: Dict) -> str:
@@ -48,11 +58,13 @@ def create_job(repo_url: str, output_dir: str, options: Dict) -> str:
         job_id=job_id,
         state="queued",
         progress=0,
-        logs=[f"Job {job_id} queued for repository: {repo_url}"],
+        logs=deque([f"Job {job_id} queued for repository: {repo_url}"], maxlen=_MAX_LOGS),
         result=None,
         error_message=None,
         created_at=datetime.utcnow().isoformat(),
         completed_at=None,
+        logs_total=1,
+        version=0,
     )
 
     with _jobs_lock:
@@ -80,7 +92,8 @@ def get_job(job_id: str) -> Optional[JobState]:
         Job state dict or None if not found
     """
     with _jobs_lock:
-        return _jobs.get(job_id)
+        job = _jobs.get(job_id)
+        return _snapshot(job) if job else None
 
 
 def list_jobs() -> List[JobState]:
@@ -91,7 +104,57 @@ def list_jobs() -> List[JobState]:
         List of job states
     """
     with _jobs_lock:
-        return list(_jobs.values())
+        return [_snapshot(job) for job in _jobs.values()]
+
+
+def get_stats_bytes(job_id: str) -> Optional[bytes]:
+    """
+    Get the cached stats.json contents of a finished job.
+
+    Args:
+        job_id: Job identifier
+
+    Returns:
+        File bytes or None if the job hasn't finished or had no stats.json
+    """
+    with _jobs_lock:
+        return _stats_bytes.get(job_id)
+
+
+def wait_for_change(job_id: str, version: int, timeout: float) -> None:
+    """
+    Block until the job's version differs from `version`, the job has finished, or `timeout` passes.
+
+    Args:
+        job_id: Job identifier
+        version: Version the caller last saw
+        timeout: Maximum seconds to wait
+    """
+    def changed() -> bool:
+        job = _jobs.get(job_id)
+        return job is None or job["version"] != version or job["state"] in ("done", "error")
+
+    with _jobs_changed:
+        _jobs_changed.wait_for(changed, timeout)
+
+
+def _snapshot(job: JobState) -> JobState:
+    # Copy under the lock: the worker thread keeps appending to the live deque.
+    return JobState(**{**job, "logs": list(job["logs"])})
+
+
+def _touch(job: JobState) -> None:
+    """Record a change to `job`; caller holds _jobs_lock."""
+    job["version"] += 1
+    _jobs_changed.notify_all()
+
+
+def _append_log(job: JobState, line: str) -> None:
+    """Append a log line; caller holds _jobs_lock."""
+    # maxlen deque drops the oldest line once _MAX_LOGS are kept.
+    job["logs"].append(line)
+    job["logs_total"] += 1
+    _touch(job)
 
 
 def _run_job(
@@ -110,18 +173,15 @@ def _run_job(
     # Update state to running
     with _jobs_lock:
         _jobs[job_id]["state"] = "running"
+        _touch(_jobs[job_id])
 
     def progress_callback(message: str, percent: int):
         """Update job progress."""
+        line = f"[{datetime.utcnow().strftime('%H:%M:%S')}] {message}"
         with _jobs_lock:
             if job_id in _jobs:
                 _jobs[job_id]["progress"] = percent
-                _jobs[job_id]["logs"].append(
-                    f"[{datetime.utcnow().strftime('%H:%M:%S')}] {message}"
-                )
-                # Keep only recent logs
-                if len(_jobs[job_id]["logs"]) > _MAX_LOGS:
-                    _jobs[job_id]["logs"] = list(_jobs[job_id]["logs"])[-_MAX_LOGS:]
+                _append_log(_jobs[job_id], line)
 
     try:
         result = generate_dataset_with_progress(
@@ -131,16 +191,32 @@ def _run_job(
             progress_cb=progress_callback,
         )
 
+        # Outputs are final now; hash them once so downloads can revalidate without disk access.
+        etags: Dict[str, str] = {}
+        for name, path in result.get("files", {}).items():
+            try:
+                etags[name] = file_digest128(Path(path)).hex()
+            except OSError:
+                pass
+        result["etags"] = etags
+
+        try:
+            stats = (Path(result["output_dir"]) / "stats.json").read_bytes()
+        except (KeyError, OSError):
+            stats = None
+
         with _jobs_lock:
+            if stats is not None:
+                _stats_bytes[job_id] = stats
             _jobs[job_id]["state"] = "done"
             _jobs[job_id]["progress"] = 100
             _jobs[job_id]["result"] = result
             _jobs[job_id]["completed_at"] = datetime.utcnow().isoformat()
-            _jobs[job_id]["logs"].append("Job completed successfully!")
+            _append_log(_jobs[job_id], "Job completed successfully!")
 
     except Exception as e:
         with _jobs_lock:
             _jobs[job_id]["state"] = "error"
             _jobs[job_id]["error_message"] = str(e)
             _jobs[job_id]["completed_at"] = datetime.utcnow().isoformat()
-            _jobs[job_id]["logs"].append(f"Job failed: {str(e)}")
\ No newline at end of file
+            _append_log(_jobs[job_id], f"Job failed: {str(e)}")
@@ -52,6 +52,8 @@ def generate_dataset_with_progress(
         include_errors=options.get("include_errors", True),
         include_config=options.get("include_config", True),
         include_logging=options.get("include_logging", True),
+        dedup_mode=options.get("dedup_mode", "exact"),
+        workers=options.get("workers"),
         progress_cb=progress_cb,
     )
 
@@ -4,6 +4,9 @@ class DatasetGenerator {
     constructor() {
         this.currentJobId = null;
         this.pollInterval = null;
+        this.logLines = [];
+        this.logsSince = 0;
+        this.jobVersion = -1;
 
         // DOM elements
         this.repoUrlInput = document.getElementById('repo_url');
@@ -73,7 +76,7 @@ class DatasetGenerator {
             this.startBtn.style.display = 'none';
             this.resetBtn.style.display = 'inline-flex';
             this.disableForm(true);
-            this.pollInterval = setInterval(() => this.pollJob(), 1000);
+            this.pollJob();
 
             // Initial status update
             this.updateStatus('running', 'Job started...');
@@ -89,8 +92,15 @@ class DatasetGenerator {
     async pollJob() {
         if (!this.currentJobId) return;
 
+        // Long-poll: the server holds the request until the job changes (or ~25s pass),
+        // and the next request is only issued once this one has been handled.
+        const jobId = this.currentJobId;
+        let retryDelay = 0;
+
         try {
-            const response = await fetch(`/api/jobs/${this.currentJobId}`);
+            const response = await fetch(
+                `/api/jobs/${jobId}/wait?version=${this.jobVersion}&since=${this.logsSince}`
+            );
 
             if (!response.ok) {
                 throw new Error('Failed to fetch job status');
@@ -98,26 +108,36 @@ class DatasetGenerator {
 
             const job = await response.json();
 
+            // Job was reset while the request was pending
+            if (jobId !== this.currentJobId) return;
+            this.jobVersion = job.version;
+
             // Update progress
             this.updateProgress(job.progress);
 
             // Update status text
             this.updateStatus(job.state, job.state.charAt(0).toUpperCase() + job.state.slice(1));
 
-            // Update logs
+            // Update logs (the server only sends lines after logsSince)
             this.updateLogs(job.logs);
+            this.logsSince = job.next_since;
 
             // Handle job completion
             if (job.state === 'done') {
-                clearInterval(this.pollInterval);
                 this.showResults(job);
+                return;
             } else if (job.state === 'error') {
-                clearInterval(this.pollInterval);
                 this.showError(job.error_message || 'Job failed');
+                return;
             }
 
         } catch (error) {
             console.error('Polling error:', error);
+            retryDelay = 1000;
+        }
+
+        if (jobId === this.currentJobId) {
+            this.pollInterval = setTimeout(() => this.pollJob(), retryDelay);
         }
     }
 
@@ -188,8 +208,8 @@ class DatasetGenerator {
         if (!logs || logs.length === 0) return;
 
         // Show only last 200 logs
-        const recentLogs = logs.slice(-200);
-        this.logsOutput.textContent = recentLogs.join('\n');
+        this.logLines = this.logLines.concat(logs).slice(-200);
+        this.logsOutput.textContent = this.logLines.join('\n');
 
         // Auto-scroll to bottom
         const logsContainer = document.getElementById('logs_container');
@@ -256,7 +276,7 @@ class DatasetGenerator {
         // Clear current job
         this.currentJobId = null;
         if (this.pollInterval) {
-            clearInterval(this.pollInterval);
+            clearTimeout(this.pollInterval);
             this.pollInterval = null;
         }
 
@@ -270,6 +290,9 @@ class DatasetGenerator {
         this.disableForm(false);
 
         // Clear logs and progress
+        this.logLines = [];
+        this.logsSince = 0;
+        this.jobVersion = -1;
         this.logsOutput.textContent = '';
         this.updateProgress(0);
         this.updateStatus('running', 'Ready');
@@ -0,0 +1,33 @@
+from gh_chat_dataset.discover import discover_files
+
+
+def test_discover_files_prunes_excluded_dirs(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "mod.py").write_text("x = 1\n")
+    (tmp_path / "README.md").write_text("# Title\n")
+    (tmp_path / "notes.txt").write_text("skip\n")
+    (tmp_path / "node_modules" / "lib").mkdir(parents=True)
+    (tmp_path / "node_modules" / "lib" / "index.js").write_text("module.exports = 1;\n")
+
+    found = [p.relative_to(tmp_path).as_posix() for p in discover_files(tmp_path)]
+    assert found == ["README.md", "pkg/mod.py"]
+
+
+def test_discover_files_skips_large_binary_and_minified(tmp_path):
+    (tmp_path / "ok.js").write_text("function f() {\n  return 1;\n}\n")
+    (tmp_path / "bundle.min.js").write_text("var a=1;" * 1000)
+    (tmp_path / "blob.py").write_bytes(b"x = 1\n\0\0\0")
+    (tmp_path / "huge.md").write_text("# Title\n" + "word " * 200_000)
+    (tmp_path / "long_lines.md").write_text("para " * 1000)
+
+    found = [p.name for p in discover_files(tmp_path)]
+    assert found == ["long_lines.md", "ok.js"]
+
+
+def test_discover_files_matches_extensions_case_insensitively(tmp_path):
+    (tmp_path / "README.MD").write_text("# Title\n")
+    (tmp_path / "notes.Md").write_text("# Notes\n")
+    (tmp_path / "data.TXT").write_text("skip\n")
+
+    found = [p.name for p in discover_files(tmp_path)]
+    assert found == ["README.MD", "notes.Md"]
@@ -0,0 +1,74 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+from gh_chat_dataset.semantic_pipeline import embedder as embedder_module
+from gh_chat_dataset.semantic_pipeline.embedder import EMBED_DIM, OpenAIEmbedder
+from gh_chat_dataset.semantic_types import Span
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.inputs = []
+
+    async def create(self, model, input):
+        self.inputs.extend(input)
+        data = [SimpleNamespace(index=i, embedding=[float(len(text))] * EMBED_DIM) for i, text in enumerate(input)]
+        return SimpleNamespace(data=data)
+
+
+class FakeClient:
+    opened = 0
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    async def __aenter__(self):
+        FakeClient.opened += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+
+def _embedder(cache_dir, monkeypatch):
+    fake = FakeEmbeddings()
+    monkeypatch.setattr(embedder_module, "AsyncOpenAI", lambda: FakeClient(fake))
+    return OpenAIEmbedder(cache_dir=cache_dir), fake
+
+
+def test_embedding_cache_reuses_vectors_across_instances(tmp_path, monkeypatch):
+    spans = [Span(Path(f"m{i}.py"), "function", "x" * (i + 1), 1, 2) for i in range(3)]
+    first = _embedder(tmp_path, monkeypatch)[0].embed_spans(spans[:2])
+
+    second, fake = _embedder(tmp_path, monkeypatch)
+    edited = Span(Path("m0.py"), "function", "changed", 1, 2)
+    out = second.embed_spans([spans[1], spans[2], edited])
+
+    assert fake.inputs == ["xxx", "changed"]
+    # Cached rows come back int8-dequantized; fresh ones are exact.
+    np.testing.assert_allclose(out[0], first[1], rtol=1e-6)
+    assert out[1][0] == 3.0 and out[2][0] == 7.0
+
+
+def test_embed_spans_splits_missing_into_concurrent_batches(tmp_path, monkeypatch):
+    spans = [Span(Path(f"m{i}.py"), "function", "x" * (i + 1), 1, 2) for i in range(5)]
+    embedder, fake = _embedder(tmp_path, monkeypatch)
+    embedder.batch_size = 2
+    out = embedder.embed_spans(spans)
+
+    assert sorted(fake.inputs) == sorted(span.content for span in spans)
+    assert [row[0] for row in out] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert (tmp_path / "embeddings.i8").stat().st_size == 5 * EMBED_DIM
+
+
+def test_each_embed_spans_call_opens_its_own_client(monkeypatch):
+    # Each call runs its own event loop; a client reused from an earlier loop would fail.
+    embedder, fake = _embedder(None, monkeypatch)
+    FakeClient.opened = 0
+    embedder.embed_spans([Span(Path("a.py"), "function", "a", 1, 2)])
+    embedder.embed_spans([Span(Path("b.py"), "function", "bb", 1, 2)])
+
+    assert FakeClient.opened == 2
+    assert fake.inputs == ["a", "bb"]
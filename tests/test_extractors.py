@@ -41,3 +41,19 @@ def test_extract_js_items_jsdoc():
     )
     items = list(extract_js_items("a.js", js))
     assert any("Multiply two numbers." in i.get("jsdoc", "") for i in items)
+
+
+def test_extract_js_items_jsdoc_does_not_span_comments():
+    js = (
+        "/** File header. */\n"
+        "const x = 1;\n"
+        "/** Add numbers. */\n"
+        "function add(a, b) {\n"
+        "  if (a) { return a + b; }\n"
+        "  return b;\n"
+        "}\n"
+    )
+    items = list(extract_js_items("a.js", js))
+    assert [i["name"] for i in items] == ["add"]
+    assert items[0]["jsdoc"] == "Add numbers."
+    assert items[0]["code"].endswith("return b;\n}")
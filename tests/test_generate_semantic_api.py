@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import inspect
+import itertools
+import sys
+from pathlib import Path
+
+import orjson
+from anthropic.resources.messages import AsyncMessages
+from anthropic.types.message_create_params import MessageCreateParamsNonStreaming
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import generate_semantic_api  # noqa: E402
+from gh_chat_dataset.semantic_types import Span  # noqa: E402
+
+
+def _spans(count):
+    return [
+        Span(
+            source_path=Path(f"mod{i}.py"),
+            kind="function_definition",
+            content=f"def f{i}():\n" + f"    return {i}\n" * 40,
+            line_start=1,
+            line_end=41,
+        )
+        for i in range(count)
+    ]
+
+
+def _generator(monkeypatch, spans):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    monkeypatch.setattr(generate_semantic_api, "load_tagged_spans", lambda repo, cache_dir: spans)
+    gen = generate_semantic_api.DatasetGenerator(use_batch=False)
+
+    async def fake_generate(span, q_type, template, repo_name=""):
+        # Distinct answers so near-duplicate filtering keeps every span.
+        answer = " ".join(f"{span.source_path.stem}-word{i}" for i in range(30))
+        return gen._build_records(span, q_type, f"What does {span.source_path}?", answer, "bad")
+
+    gen.generate_for_span = fake_generate
+    return gen
+
+
+def _run(tmp_path, monkeypatch, spans, max_spans, gen=None):
+    gen = gen or _generator(monkeypatch, spans)
+    return asyncio.run(gen.generate_dataset(tmp_path, tmp_path / "out", "ds", max_spans=max_spans))
+
+
+def _cids(path):
+    return {orjson.loads(line)["metadata"]["cid"] for line in path.read_bytes().splitlines()}
+
+
+def test_resume_drops_records_outside_current_work(tmp_path, monkeypatch):
+    spans = _spans(6)
+    first = _run(tmp_path, monkeypatch, spans, max_spans=6)
+    assert first["sft"]["total"] == 6
+
+    second = _run(tmp_path, monkeypatch, spans, max_spans=2)
+    assert second["sft"]["total"] == 2
+
+    out = tmp_path / "out"
+    expected = _cids(out / "ds_sft_raw.jsonl")
+    assert len(expected) == 2
+    for fmt in ("sft", "dpo", "grpo"):
+        assert _cids(out / f"ds_{fmt}_raw.jsonl") == expected
+        split_cids = set()
+        for split_name in ("train", "valid", "test"):
+            split_cids |= _cids(out / f"ds_{fmt}_{split_name}.jsonl")
+        assert split_cids == expected
+
+
+def test_resume_tolerates_cids_already_indexed(tmp_path, monkeypatch):
+    spans = _spans(3)
+    gen = _generator(monkeypatch, spans)
+    assert _run(tmp_path, monkeypatch, spans, max_spans=3, gen=gen)["sft"]["total"] == 3
+
+    # Same generator again: every resumed cid is already in its LSH index.
+    assert _run(tmp_path, monkeypatch, spans, max_spans=3, gen=gen)["sft"]["total"] == 3
+
+
+def test_message_params_match_the_installed_sdk(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    gen = generate_semantic_api.DatasetGenerator()
+    params = gen._message_params([{"type": "text", "text": "hi"}], 100)
+
+    # Live calls: binding fails on any keyword messages.create doesn't take.
+    inspect.signature(AsyncMessages.create).bind(None, **params)
+    # Batch requests carry the same dict as their `params`.
+    assert set(params) <= set(MessageCreateParamsNonStreaming.__annotations__)
+
+
+def test_generate_dataset_can_run_repeatedly_through_the_sdk(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    spans = _spans(2)
+    monkeypatch.setattr(generate_semantic_api, "load_tagged_spans", lambda repo, cache_dir: spans)
+    counter = itertools.count()
+    calls = []
+
+    def handler(request):
+        # Distinct wording per request, so dedup keeps every answer across both runs.
+        seed = hashlib.sha256(request.content + str(next(counter)).encode()).hexdigest()
+        text = " ".join(f"{seed[i:i + 6]}w{i}" for i in range(0, 60, 2))
+        calls.append(request.url.path)
+        return generate_semantic_api.httpx.Response(200, json={
+            "id": "msg_1", "type": "message", "role": "assistant", "model": "claude-sonnet-4-6",
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": 1, "output_tokens": 1},
+        })
+
+    monkeypatch.setattr(
+        generate_semantic_api,
+        "_http_client",
+        lambda: generate_semantic_api.httpx.AsyncClient(transport=generate_semantic_api.httpx.MockTransport(handler)),
+    )
+    gen = generate_semantic_api.DatasetGenerator(use_batch=False)
+    for run in ("first", "second"):
+        stats = asyncio.run(gen.generate_dataset(tmp_path, tmp_path / run, "ds", max_spans=2))
+        assert stats["sft"]["total"] == 2
+    assert calls == ["/v1/messages"] * 8
@@ -0,0 +1,37 @@
+import subprocess
+
+from gh_chat_dataset import cli
+
+
+def _repo(path, text):
+    path.mkdir(parents=True)
+    subprocess.run(["git", "init", "-q"], cwd=path, check=True)
+    (path / "mod.py").write_text(text)
+    subprocess.run(["git", "add", "mod.py"], cwd=path, check=True)
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "-m", "init"], cwd=path, check=True
+    )
+    return path.as_uri()
+
+
+def test_same_owner_and_name_on_different_hosts_get_separate_mirrors():
+    assert cli._mirror_path("https://github.com/a/b") != cli._mirror_path("https://gitlab.com/a/b")
+
+
+def test_mirror_of_another_url_is_recloned(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "MIRROR_ROOT", tmp_path / "mirrors")
+    first = _repo(tmp_path / "x" / "a" / "b", "FIRST = 1\n")
+    second = _repo(tmp_path / "y" / "a" / "b", "SECOND = 2\n")
+
+    # Force both URLs onto one mirror directory, as the old owner__name slug did.
+    shared = tmp_path / "mirrors" / "a__b.git"
+    monkeypatch.setattr(cli, "_mirror_path", lambda repo_url: shared)
+    assert cli._update_mirror(first) == shared
+    assert cli._update_mirror(second) == shared
+
+    origin = subprocess.run(
+        ["git", "--git-dir", str(shared), "config", "remote.origin.url"], capture_output=True, text=True
+    ).stdout.strip()
+    assert origin == second
+    cli.shallow_clone(second, str(tmp_path / "work"))
+    assert (tmp_path / "work" / "mod.py").read_text() == "SECOND = 2\n"
@@ -0,0 +1,41 @@
+from datasketch import MinHashLSH
+
+from gh_chat_dataset.postprocess import _lsh_bands, dedupe_records, record_token_totals
+from gh_chat_dataset.tokenize_util import count_tokens_approx
+
+
+def _rec(answer: str):
+    return {"messages": [{"role": "user", "content": "Explain foo"}, {"role": "assistant", "content": answer}]}
+
+
+BASE = " ".join(f"word{i}" for i in range(200))
+RECORDS = [_rec(BASE), _rec(BASE), _rec(BASE + " trailing"), _rec("something else entirely " * 20)]
+
+
+def test_exact_dedup_keeps_near_duplicates():
+    assert len(dedupe_records(RECORDS)) == 3
+
+
+def test_minhash_dedup_drops_near_duplicates():
+    out = dedupe_records(RECORDS, mode="minhash")
+    assert [r["messages"][1]["content"] for r in out] == [BASE, RECORDS[3]["messages"][1]["content"]]
+
+
+def test_lshbloom_dedup_drops_near_duplicates():
+    out = dedupe_records(RECORDS, mode="lshbloom")
+    assert [r["messages"][1]["content"] for r in out] == [BASE, RECORDS[3]["messages"][1]["content"]]
+
+
+def test_record_token_totals_matches_per_message_count():
+    records = [RECORDS[0], {"messages": []}, {"messages": [{"role": "user", "content": ""}, {"content": None}]}]
+    expected = [
+        sum(count_tokens_approx(m["content"]) for m in r["messages"] if isinstance(m.get("content"), str))
+        for r in records
+    ]
+    assert record_token_totals(records).tolist() == expected
+
+
+def test_lshbloom_bands_match_minhash_lsh():
+    for threshold in (0.5, 0.8, 0.9):
+        lsh = MinHashLSH(threshold=threshold, num_perm=128)
+        assert _lsh_bands(threshold, 128) == (lsh.b, lsh.r)
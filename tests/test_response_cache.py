@@ -0,0 +1,16 @@
+from gh_chat_dataset.semantic_pipeline.response_cache import SemanticCache
+
+
+def test_semantic_cache_hits_and_persists(tmp_path):
+    cache = SemanticCache(tmp_path, threshold=0.9, dim=4)
+    cache.add("prompt a", [1.0, 0.0, 0.0, 0.0], "answer a")
+
+    assert cache.get_exact("prompt a") == "answer a"
+    assert cache.get_exact("prompt b") is None
+    assert cache.search([0.99, 0.05, 0.0, 0.0]) == "answer a"
+    assert cache.search([0.0, 1.0, 0.0, 0.0]) is None
+
+    cache.save()
+    reloaded = SemanticCache(tmp_path, threshold=0.9, dim=4)
+    assert reloaded.get_exact("prompt a") == "answer a"
+    assert reloaded.search([1.0, 0.0, 0.0, 0.0]) == "answer a"
@@ -0,0 +1,70 @@
+import asyncio
+import inspect
+from pathlib import Path
+from types import SimpleNamespace
+
+from anthropic.resources.messages import AsyncMessages
+from openai.resources.chat.completions import AsyncCompletions
+
+from gh_chat_dataset.semantic_pipeline import synthesizer as synthesizer_module
+from gh_chat_dataset.semantic_pipeline.synthesizer import SemanticSynthesizer
+from gh_chat_dataset.semantic_types import Cluster, Span
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        # Validate against the installed SDK, so unsupported arguments fail here too.
+        inspect.signature(AsyncCompletions.create).bind(None, **kwargs)
+        self.calls += 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"critique {self.calls}"))])
+
+
+class FakeMessages:
+    async def create(self, **kwargs):
+        inspect.signature(AsyncMessages.create).bind(None, **kwargs)
+        data = {"conversation_id": "c1", "turns": [{"role": "user", "content": "q"}], "summary": {}}
+        return SimpleNamespace(content=[SimpleNamespace(type="tool_use", input=data)])
+
+
+class FakeClient:
+    opened = 0
+
+    def __init__(self, **apis):
+        self.__dict__.update(apis)
+
+    async def __aenter__(self):
+        FakeClient.opened += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+
+def _openai():
+    return SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions()))
+
+
+def test_critiques_are_cached_across_instances(tmp_path):
+    first = SemanticSynthesizer(cache_dir=tmp_path)
+    assert asyncio.run(first._critique_conversation(_openai(), '{"turns": []}')) == "critique 1"
+
+    second, openai = SemanticSynthesizer(cache_dir=tmp_path), _openai()
+    assert asyncio.run(second._critique_conversation(openai, '{"turns": []}')) == "critique 1"
+    assert asyncio.run(second._critique_conversation(openai, '{"turns": [1]}')) == "critique 1"
+    assert openai.chat.completions.calls == 1
+
+
+def test_generate_can_run_repeatedly(monkeypatch):
+    # Each generate() runs its own event loop, so clients must not outlive one call.
+    monkeypatch.setattr(synthesizer_module, "AsyncAnthropic", lambda: FakeClient(messages=FakeMessages()))
+    monkeypatch.setattr(synthesizer_module, "AsyncOpenAI", lambda: FakeClient(chat=_openai().chat))
+    FakeClient.opened = 0
+    synthesizer = SemanticSynthesizer()
+    cluster = Cluster("c", [Span(Path("m.py"), "function", "def f(): pass", 1, 1)], ["tag"])
+
+    assert [r.conversation_id for r in synthesizer.generate([cluster])] == ["c1"]
+    assert [r.conversation_id for r in synthesizer.generate([cluster])] == ["c1"]
+    assert FakeClient.opened == 4
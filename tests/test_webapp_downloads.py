@@ -0,0 +1,35 @@
+from gh_chat_dataset.webapp import jobs, server
+
+
+def _done_job(job_id, output_dir, monkeypatch):
+    stats = b'{"n": 1}'
+    (output_dir / "stats.json").write_bytes(stats)
+    monkeypatch.setitem(jobs._jobs, job_id, jobs.JobState(
+        job_id=job_id,
+        state="done",
+        progress=100,
+        logs=[],
+        result={"output_dir": str(output_dir), "etags": {"stats": "abc"}},
+        error_message=None,
+        created_at="",
+        completed_at="",
+        logs_total=0,
+        version=0,
+    ))
+    monkeypatch.setitem(jobs._stats_bytes, job_id, stats)
+
+
+def test_downloads_outside_output_root_are_refused_before_fast_paths(tmp_path, monkeypatch):
+    root, outside = tmp_path / "outputs", tmp_path / "elsewhere"
+    (root / "job").mkdir(parents=True)
+    outside.mkdir()
+    monkeypatch.setattr(server, "OUTPUT_ROOT", str(root))
+    _done_job("inside", root / "job", monkeypatch)
+    _done_job("outside", outside, monkeypatch)
+
+    with server.app.test_client() as client:
+        assert client.get("/api/jobs/inside/download/stats").data == b'{"n": 1}'
+        # Neither the in-memory stats copy nor the precomputed-ETag 304 bypasses containment.
+        assert client.get("/api/jobs/outside/download/stats").status_code == 403
+        revalidate = client.get("/api/jobs/outside/download/stats", headers={"If-None-Match": '"abc"'})
+        assert revalidate.status_code == 403